@@ -0,0 +1,117 @@
+# benchmark_analysis.py
+# Compare latency and peak memory of analysis computation before and after the single pass rewrite.
+# Usage: python -m experiments.benchmark_analysis [--rows 500000] [--repeat 3] [--streaming]
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.analysis import compute_analysis
+from src.constants import ANALYSIS_CHUNK_SIZE, ANALYSIS_MAX_POINTS
+from src.loader import write_columnar, read_columnar, iter_columnar_chunks
+from src.normalization import normalize_frame
+from src.streaming import compute_analysis_streaming
+
+
+def make_raw_frame(rows: int) -> pd.DataFrame:
+    """Rows each minute in upload format, plan and fact come as strings with decimal comma"""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2020-01-01", periods=rows, freq="min")
+    fact = np.clip(rng.normal(20, 10, rows), 0, None).round(3)
+    plan = np.clip(fact + rng.normal(0, 2, rows), 0, None).round(3)
+    return pd.DataFrame({
+        "date": dates,
+        "object_name": "Zadarya",
+        "plan": pd.Series(plan).astype(str).str.replace(".", ",", regex=False),
+        "fact": pd.Series(fact).astype(str).str.replace(".", ",", regex=False),
+        "unit": "MWh",
+        "cloudiness": rng.uniform(0, 100, rows).round(1),
+        "temperature": rng.normal(15, 8, rows).round(1),
+        "wind_speed": rng.uniform(0, 15, rows).round(1),
+    })
+
+
+def legacy_analysis(df: pd.DataFrame) -> dict:
+    """Data part of create_analysis before the rewrite: frame copies, derived columns and pivot_table per surface"""
+    df_correlation_matrix = df.copy(deep=True)
+    for col in ['plan', 'fact', 'cloudiness', 'temperature', 'wind_speed']:
+        df_correlation_matrix[col] = df_correlation_matrix[col].astype(str).str.replace(',', '.').astype(float)
+    correlation_matrix = df_correlation_matrix[['plan', 'fact', 'cloudiness', 'temperature', 'wind_speed']].corr()
+
+    df_weather_temperature = df.copy(deep=True)
+    df_weather_temperature['year'] = df_weather_temperature['date'].dt.year
+    df_weather_temperature['hour'] = df_weather_temperature['date'].dt.hour
+    df_weather_temperature['day_of_year'] = df_weather_temperature['date'].dt.dayofyear
+    weather_pivot = df_weather_temperature.reset_index().pivot_table(index='hour', columns='day_of_year', values='temperature')
+
+    df_solar_generation = df.copy(deep=True)
+    df_solar_generation['fact'] = df_solar_generation['fact'].str.replace(',', '.').astype(float)
+    df_solar_generation['year'] = df_solar_generation['date'].dt.year
+    df_solar_generation['hour'] = df_solar_generation['date'].dt.hour
+    df_solar_generation['month'] = df_solar_generation['date'].dt.month
+    df_solar_generation['day_of_year'] = df_solar_generation['date'].dt.dayofyear
+    solar_pivot = df_solar_generation.reset_index().pivot_table(index='hour', columns='day_of_year', values='fact')
+
+    df_comparison = df.copy(deep=True)
+    df_comparison["plan"] = pd.to_numeric(df_comparison["plan"].replace(',', '', regex=True), errors="coerce")
+    df_comparison["fact"] = pd.to_numeric(df_comparison["fact"].replace(',', '', regex=True), errors="coerce")
+    return {"correlation": correlation_matrix, "weather": weather_pivot, "solar": solar_pivot, "series": df_comparison}
+
+
+def measure(func, argument, repeat: int) -> tuple[float, float]:
+    """Best wall time in seconds and peak traced allocation in MiB"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(argument)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak / 2 ** 20
+
+
+def streaming_benchmark(rows: int, repeat: int) -> None:
+    """In-memory and out-of-core analysis of columnar artifacts of growing size, streaming peak should stay flat"""
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (rows, rows * 2, rows * 4):
+            file_location = Path(directory) / f"{size}.arrow"
+            write_columnar(normalize_frame(make_raw_frame(size)), file_location)
+            for name, func in [
+                ("in-memory", lambda path: compute_analysis(read_columnar(path), ANALYSIS_MAX_POINTS)),
+                ("streaming", lambda path: compute_analysis_streaming(
+                    iter_columnar_chunks(path, ANALYSIS_CHUNK_SIZE), size, ANALYSIS_MAX_POINTS)),
+            ]:
+                seconds, peak = measure(func, file_location, repeat)
+                print(f"{size:>10} rows {name:12} {seconds * 1000:10.1f} ms {peak:10.1f} MiB peak")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--streaming", action="store_true", help="compare in-memory and out-of-core analysis")
+    args = parser.parse_args()
+    if args.streaming:
+        streaming_benchmark(args.rows, args.repeat)
+        return
+
+    raw = make_raw_frame(args.rows)
+    normalized = normalize_frame(raw)
+    print(f"rows: {args.rows}, raw frame: {raw.memory_usage(deep=True).sum() / 2 ** 20:.1f} MiB, "
+          f"normalized frame: {normalized.memory_usage(deep=True).sum() / 2 ** 20:.1f} MiB")
+    for name, func, df in [
+        ("legacy (copies + pivot_table)", legacy_analysis, raw),
+        ("compute_analysis (bincount)", compute_analysis, normalized),
+    ]:
+        seconds, peak = measure(func, df, args.repeat)
+        print(f"{name:32} {seconds * 1000:10.1f} ms {peak:10.1f} MiB peak")
+
+
+if __name__ == "__main__":
+    main()
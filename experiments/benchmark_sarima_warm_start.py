@@ -0,0 +1,71 @@
+# benchmark_sarima_warm_start.py
+# Compare cold SARIMA fit with warm-started fit and append of new rows after dataset grows by --grow hours.
+# Usage: python -m experiments.benchmark_sarima_warm_start [--days 60] [--grow 24] [--horizon 48]
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+from src.constants import BASE_DIR, AvailableModel
+from src.model import MODEL_PARAMS, prepare_frame
+from src.normalization import normalize_frame
+
+SAMPLE = BASE_DIR / "static" / "data" / "a941abe7-b288-4130-a797-6624a7ca2f85.csv"
+
+
+def fit(train: pd.Series, start_params: np.ndarray | None = None):
+    params = MODEL_PARAMS[AvailableModel.SARIMA]
+    model = SARIMAX(train, order=params["order"], seasonal_order=params["seasonal_order"])
+    return model.fit(start_params=start_params, disp=False, low_memory=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", default="2023-03-01")
+    parser.add_argument("--days", type=int, default=60, help="train window before dataset grows")
+    parser.add_argument("--grow", type=int, default=24, help="hours appended to dataset")
+    parser.add_argument("--horizon", type=int, default=48)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    df = normalize_frame(pd.read_csv(SAMPLE))
+    df, _ = prepare_frame(df[args.start:])
+    series = df["fact"]
+    rows = args.days * 24
+    previous_train, train = series.iloc[:rows], series.iloc[:rows + args.grow]
+
+    previous = fit(previous_train)
+    results = {}
+    start = time.perf_counter()
+    results["cold fit"] = fit(train)
+    cold_seconds = time.perf_counter() - start
+    timings = {"cold fit": cold_seconds}
+
+    start = time.perf_counter()
+    results["warm start"] = fit(train, np.asarray(previous.params))
+    timings["warm start"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # what fit_model does for at most SARIMA_APPEND_MAX_ROWS new rows
+    params = MODEL_PARAMS[AvailableModel.SARIMA]
+    model = SARIMAX(train, order=params["order"], seasonal_order=params["seasonal_order"])
+    results["append"] = model.filter(previous.params, cov_type="none", low_memory=True)
+    timings["append"] = time.perf_counter() - start
+
+    reference = results["cold fit"].forecast(args.horizon).to_numpy()
+    print(f"train rows: {len(previous_train)} -> {len(train)}, forecast horizon: {args.horizon}")
+    for name, fitted in results.items():
+        retvals = getattr(fitted, "mle_retvals", None) or {}
+        iterations = retvals.get("iterations", "-")
+        difference = np.abs(fitted.forecast(args.horizon).to_numpy() - reference).max()
+        print(
+            f"{name:12} {timings[name]:8.2f} s  x{cold_seconds / timings[name]:6.1f}  "
+            f"iterations {iterations!s:>4}  llf {fitted.llf:12.2f}  max forecast difference {difference:.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmark_xgboost_features.py
+# Compare fit time and peak memory of XGBoost feature building and fit before and after the float32 feature matrix rewrite.
+# Every variant runs in a fresh process, so peak RSS of one doesn't hide the other.
+# Usage: python -m experiments.benchmark_xgboost_features [--rows 200000] [--repeat 3]
+import argparse
+import multiprocessing
+import resource
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from src.constants import XGBOOST_THREADS, AvailableModel
+from src.model import MODEL_PARAMS, _xgboost_features, fit_model, prepare_frame
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    """Normalized hourly frame with daily seasonality of fact"""
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2015-01-01", periods=rows, freq="h", name="date")
+    hours = np.arange(rows)
+    fact = np.clip(20 + 10 * np.sin(hours * 2 * np.pi / 24) + rng.normal(0, 2, rows), 0, None)
+    return pd.DataFrame({
+        "plan": fact + rng.normal(0, 2, rows),
+        "fact": fact,
+        "cloudiness": rng.uniform(0, 100, rows),
+        "temperature": rng.normal(15, 8, rows),
+        "wind_speed": rng.uniform(0, 15, rows),
+    }, index=index)
+
+
+def legacy_features(df: pd.DataFrame, test_size: int) -> tuple[pd.DataFrame, pd.Series]:
+    """Lag frame before the rewrite: copy of the frame, one shifted float64 column per lag"""
+    df_lags = df.copy()
+    for i in range(1, MODEL_PARAMS[AvailableModel.XGBOOST]["look_back"] + 1):
+        df_lags[f'lag_{i}'] = df_lags['fact'].shift(i)
+    df_lags = df_lags.dropna()
+    return df_lags.drop(columns=['fact']).iloc[:-test_size], df_lags['fact'].iloc[:-test_size]
+
+
+def legacy_fit(df: pd.DataFrame, test_size: int):
+    X_train, y_train = legacy_features(df, test_size)
+    model = xgb.XGBRegressor(objective="reg:squarederror")
+    model.fit(X_train, y_train)
+    return model
+
+
+def run(variant: str, rows: int) -> dict:
+    df, test_size = prepare_frame(make_frame(rows))
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    if variant == "legacy":
+        legacy_features(df, test_size)
+    else:
+        _xgboost_features(df)
+    features_seconds = time.perf_counter() - start
+    features_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    if variant == "legacy":
+        legacy_fit(df, test_size)
+    else:
+        fit_model(df, test_size, AvailableModel.XGBOOST)
+    fit_seconds = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "features_seconds": features_seconds,
+        "features_peak_mb": features_peak / 1024 / 1024,
+        "fit_seconds": fit_seconds,
+        # ru_maxrss is in kilobytes on Linux
+        "fit_peak_rss_growth_mb": (rss_after - rss_before) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000, help="hourly rows of the frame")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"rows: {args.rows}, XGBOOST_THREADS: {XGBOOST_THREADS}")
+    context = multiprocessing.get_context("spawn")
+    for variant in ("legacy", "float32"):
+        results = []
+        for _ in range(args.repeat):
+            with context.Pool(1) as pool:
+                results.append(pool.apply(run, (variant, args.rows)))
+        best = {key: min(result[key] for result in results) for key in results[0]}
+        print(
+            f"{variant:8} features {best['features_seconds']:6.3f} s, peak {best['features_peak_mb']:7.1f} MB | "
+            f"features + fit {best['fit_seconds']:6.2f} s, peak RSS growth {best['fit_peak_rss_growth_mb']:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
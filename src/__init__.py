@@ -1,8 +1,13 @@
 __all__ = (
     "Base",
     "Analysis",
+    "Blob",
     "Data",
+    "DataPoint",
+    "DataRollup",
+    "FittedModel",
+    "KpiRollup",
     "Prediction",
 )
 
-from src.database import Base, Analysis, Data, Prediction
+from src.database import Base, Analysis, Blob, Data, DataPoint, DataRollup, FittedModel, KpiRollup, Prediction
@@ -1,46 +1,155 @@
+import base64
+
 import numpy as np
+import orjson
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from src.constants import AnalysisMode
+from src.downsampling import downsample_series
+from src.normalization import MEASURE_COLUMNS
 
-def create_analysis(df: pd.DataFrame) -> str:
-    df_correlation_matrix = df.copy(deep=True)
-    for col in ['plan', 'fact', 'cloudiness', 'temperature', 'wind_speed']:
-        df_correlation_matrix[col] = df_correlation_matrix[col].astype(str).str.replace(',', '.').astype(float)
-    correlation_matrix = df_correlation_matrix[['plan', 'fact', 'cloudiness', 'temperature', 'wind_speed']].corr()
-    # matrix_json_str: str = correlation_matrix.to_json(orient="records")
-    # matrix_dict: list[dict] = json.loads(matrix_json_str)
-
-    df_weather_temperature = df.copy(deep=True)
-    df_weather_temperature['year'] = df_weather_temperature['date'].dt.year
-    df_weather_temperature['hour'] = df_weather_temperature['date'].dt.hour
-    df_weather_temperature['day_of_year'] = df_weather_temperature['date'].dt.dayofyear
-    weather_pivot = df_weather_temperature.reset_index().pivot_table(index='hour', columns='day_of_year', values='temperature')
-    weather_pivot = weather_pivot.fillna(0)
-    x_weather = weather_pivot.columns.values
-    y_weather = weather_pivot.index.values
-    x_weather, y_weather = np.meshgrid(x_weather, y_weather)
-    z_weather = weather_pivot.values
-    # weather_dict = {"x": X.tolist(), "y": Y.tolist(), "z": Z.tolist()} # x, y, z
-    
-    df_solar_generation = df.copy(deep=True)
-    df_solar_generation['fact'] = df_solar_generation['fact'].str.replace(',', '.').astype(float)
-    df_solar_generation['year'] = df_solar_generation['date'].dt.year
-    df_solar_generation['hour'] = df_solar_generation['date'].dt.hour
-    df_solar_generation['month'] = df_solar_generation['date'].dt.month
-    df_solar_generation['day_of_year'] = df_solar_generation['date'].dt.dayofyear
-    solar_pivot = df_solar_generation.reset_index().pivot_table(index='hour', columns='day_of_year', values='fact')
-    x_solar = solar_pivot.columns.values
-    y_solar = solar_pivot.index.values
-    x_solar, y_solar = np.meshgrid(x_solar, y_solar)
-    z_solar = solar_pivot.values
-    # solar_dict = {"x": X.tolist(), "y": Y.tolist(), "z": Z.tolist()}
-    
-    df_comparison = df.copy(deep=True)
-    df_comparison["plan"] = pd.to_numeric(df_comparison["plan"].replace(',', '', regex=True), errors="coerce")
-    df_comparison["fact"] = pd.to_numeric(df_comparison["fact"].replace(',', '', regex=True), errors="coerce")
-    # comparison_dict
+# bump when results of create_analysis change, cached analyses of previous version are ignored
+ANALYSIS_VERSION = 3
+
+# plan/fact traces with more points are drawn with WebGL
+WEBGL_MIN_POINTS = 5_000
+
+
+# calendar grid is hour (0..23) x day of year (1..366), flattened as hour * DAYS_IN_GRID + day_of_year
+HOURS_IN_GRID = 24
+DAYS_IN_GRID = 367
+
+
+def calendar_keys(index: pd.DatetimeIndex) -> np.ndarray:
+    """Flat hour x day of year cell of every row, derived once and shared by all surfaces"""
+    return index.hour.to_numpy(dtype=np.intp) * DAYS_IN_GRID + index.dayofyear.to_numpy(dtype=np.intp)
+
+
+def calendar_sums(keys: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Sums and counts of non NaN values on hour x day of year grid, one bincount pass each"""
+    valid = ~np.isnan(values)
+    if not valid.all():
+        keys, values = keys[valid], values[valid]
+    size = HOURS_IN_GRID * DAYS_IN_GRID
+    sums = np.bincount(keys, weights=values, minlength=size).reshape(HOURS_IN_GRID, DAYS_IN_GRID)
+    counts = np.bincount(keys, minlength=size).reshape(HOURS_IN_GRID, DAYS_IN_GRID)
+    return sums, counts
+
+
+def calendar_surface(sums: np.ndarray, counts: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Mean of values on hour x day of year grid.
+    Like pivot_table, only hours and days having at least one value are kept, cells without values are NaN.
+    """
+    hours = np.flatnonzero(counts.any(axis=1))
+    days = np.flatnonzero(counts.any(axis=0))
+    grid = np.ix_(hours, days)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums[grid] / counts[grid]
+    return {
+        "hour": hours.astype(np.int32),
+        "day_of_year": days.astype(np.int32),
+        "values": means.astype(np.float32),
+    }
+
+
+def plan_fact_sums(plan: np.ndarray, fact: np.ndarray) -> np.ndarray:
+    """
+    Additive sums of rows having both plan and fact: count, plan, fact, absolute, squared and signed error.
+    Sums of several chunks are added elementwise, see plan_fact_stats.
+    """
+    present = ~(np.isnan(plan) | np.isnan(fact))
+    plan = plan[present].astype(np.float64)
+    fact = fact[present].astype(np.float64)
+    error = fact - plan
+    return np.array([len(plan), plan.sum(), fact.sum(), np.abs(error).sum(), (error * error).sum(), error.sum()])
+
+
+def plan_fact_stats(sums: np.ndarray) -> dict[str, float | int | None]:
+    count, plan_total, fact_total, abs_error, squared_error, error = sums.tolist()
+    if count == 0:
+        return {"rows": 0, "plan_total": 0.0, "fact_total": 0.0, "mae": None, "rmse": None, "bias": None}
+    return {
+        "rows": int(count),
+        "plan_total": plan_total,
+        "fact_total": fact_total,
+        "mae": abs_error / count,
+        "rmse": float(np.sqrt(squared_error / count)),
+        "bias": error / count, # positive when fact exceeds plan
+    }
+
+
+def compute_analysis(df: pd.DataFrame, max_points: int = 0) -> dict:
+    """
+    df is normalized frame, see src.normalization.normalize_frame.
+    Returns typed arrays: correlation matrix, hour x day of year surfaces and plan/fact series
+    with plan/fact deviation stats. Series are downsampled to at most max_points rows with LTTB, 0 keeps all rows.
+    Columns of df are used as they are, no intermediate frames are built.
+    """
+    correlation_matrix = df[MEASURE_COLUMNS].corr()
+    keys = calendar_keys(df.index)
+    # milliseconds since epoch, as expected by javascript Date
+    dates = df.index.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+    series = {col: df[col].to_numpy(dtype=np.float32) for col in ("plan", "fact")}
+    stats = plan_fact_stats(plan_fact_sums(series["plan"], series["fact"]))
+    if 0 < max_points < len(dates):
+        rows = downsample_series(dates, series, max_points)
+        dates = dates[rows]
+        series = {col: values[rows] for col, values in series.items()}
+    return {
+        "correlation": {
+            "columns": list(correlation_matrix.columns),
+            "values": np.ascontiguousarray(correlation_matrix.to_numpy(dtype=np.float32)),
+        },
+        "weather": calendar_surface(*calendar_sums(keys, df["temperature"].to_numpy())),
+        "solar": calendar_surface(*calendar_sums(keys, df["fact"].to_numpy())),
+        "series": {"date": dates, **series},
+        "stats": stats,
+    }
+
+
+def _encode_array(array: np.ndarray) -> dict:
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    return {
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "data": base64.b64encode(array.tobytes()).decode("ascii"),
+    }
+
+
+def _encode_binary(value):
+    if isinstance(value, np.ndarray):
+        return _encode_array(value)
+    if isinstance(value, dict):
+        return {key: _encode_binary(item) for key, item in value.items()}
+    return value
+
+
+def encode_analysis(results: dict, mode: AnalysisMode) -> bytes:
+    """
+    JSON mode serializes arrays as lists, float32 values are written with float32 precision and NaN as null.
+    BINARY mode replaces every array with {"dtype", "shape", "data"} where data is base64 of little-endian bytes.
+    """
+    if mode == AnalysisMode.BINARY:
+        results = _encode_binary(results)
+    return orjson.dumps(results, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def build_analysis_figure(results: dict, title: str = "Analysis results") -> go.Figure:
+    correlation = results["correlation"]
+    weather = results["weather"]
+    solar = results["solar"]
+    series = results["series"]
+    dates = pd.to_datetime(series["date"], unit="ms")
+    scatter = go.Scattergl if len(dates) >= WEBGL_MIN_POINTS else go.Scatter
+
+    # weather surface is drawn without gaps
+    z_weather = np.nan_to_num(weather["values"], nan=0)
+    x_weather, y_weather = np.meshgrid(weather["day_of_year"], weather["hour"])
+    z_solar = solar["values"]
+    x_solar, y_solar = np.meshgrid(solar["day_of_year"], solar["hour"])
     
     fig = make_subplots(
         rows=2,
@@ -56,12 +165,12 @@ def create_analysis(df: pd.DataFrame) -> str:
     )
     fig.add_trace(
         go.Heatmap(
-            z=correlation_matrix.values,
-            x=correlation_matrix.columns,
-            y=correlation_matrix.index,
+            z=correlation["values"],
+            x=correlation["columns"],
+            y=correlation["columns"],
             zmin=-1,
             zmax=1,
-            text=np.round(correlation_matrix.values, 4),
+            text=np.round(correlation["values"], 4),
             hoverinfo="text",
             showscale=False,
         ),
@@ -89,9 +198,9 @@ def create_analysis(df: pd.DataFrame) -> str:
         col=1,
     ),
     fig.add_trace(
-        go.Scatter(
-            x=df_comparison.index,
-            y=df_comparison["plan"],
+        scatter(
+            x=dates,
+            y=series["plan"],
             mode="lines",
             name="Plan (Blue)",
             line=dict(color="royalblue"),
@@ -100,9 +209,9 @@ def create_analysis(df: pd.DataFrame) -> str:
         col=2,
     )
     fig.add_trace(
-        go.Scatter(
-            x=df_comparison.index,
-            y=df_comparison["fact"],
+        scatter(
+            x=dates,
+            y=series["fact"],
             mode="lines",
             name="Fact (Red)",
             line=dict(color="firebrick"),
@@ -111,7 +220,7 @@ def create_analysis(df: pd.DataFrame) -> str:
         col=2,
     )
     fig.update_layout(
-        title="Analysis results",
+        title=title,
         title_x=0.5,
         scene1=dict(
             xaxis=dict(title_text="Day of Year", autorange="reversed"),
@@ -128,5 +237,36 @@ def create_analysis(df: pd.DataFrame) -> str:
         showlegend=False,
     )
     
-    html_content = fig.to_html()
-    return html_content
+    return fig
+
+
+def render_analysis_html(results: dict) -> str:
+    return build_analysis_figure(results).to_html()
+
+
+def render_grouped_analysis_html(grouped: dict[str, dict]) -> str:
+    """One page with report of every object, plotly.js is embedded once"""
+    parts = [
+        build_analysis_figure(results, title=f"Analysis results: {object_name}").to_html(
+            full_html=False,
+            include_plotlyjs=i == 0,
+        )
+        for i, (object_name, results) in enumerate(grouped.items())
+    ]
+    return f"<html><head><meta charset=\"utf-8\" /></head><body>{''.join(parts)}</body></html>"
+
+
+def render_analysis(results: dict, mode: AnalysisMode) -> bytes:
+    if mode == AnalysisMode.HTML:
+        return render_analysis_html(results).encode("utf-8")
+    return encode_analysis(results, mode)
+
+
+def render_grouped_analysis(grouped: dict[str, dict], mode: AnalysisMode) -> bytes:
+    if mode == AnalysisMode.HTML:
+        return render_grouped_analysis_html(grouped).encode("utf-8")
+    return encode_analysis({"objects": grouped}, mode)
+
+
+def create_analysis(df: pd.DataFrame, mode: AnalysisMode = AnalysisMode.HTML, max_points: int = 0) -> bytes:
+    return render_analysis(compute_analysis(df, max_points), mode)
@@ -1,8 +1,12 @@
 import json
-import io
+import logging
+import threading
+from contextlib import asynccontextmanager
 from typing import Annotated
 from uuid import uuid4, UUID
 
+import orjson
+import pandas as pd
 from fastapi import (
     FastAPI,
     UploadFile,
@@ -12,21 +16,109 @@ from fastapi import (
     status,
     Query,
 )
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as StarletteUploadFile
 from sqlalchemy import select, insert
-import pandas as pd
+from sqlalchemy.orm import Session
 
-from src.constants import BASE_DIR, AvailableModel, FileMimeType, FileType
-from src.schemas import DataFormat, DataRead, AnalysisFilterParams, PredictionConfig
+from src.constants import (
+    BASE_DIR,
+    DATA_DIR,
+    MAX_UPLOAD_SIZE,
+    VALIDATION_MAX_ERRORS,
+    INGEST_WORKERS,
+    MAX_BATCH_FILES,
+    MIN_PREDICTION_ROWS,
+    AvailableModel,
+    FileMimeType,
+    FileType,
+    FILE_SUFFIXES,
+    DataStatus,
+    AnalysisMode,
+    ANALYSIS_SUFFIXES,
+    ANALYSIS_MEDIA_TYPES,
+    PREWARM_PREDICTIONS,
+    PREDICTION_MAX_QUEUED,
+    WORKER_HEARTBEAT_INTERVAL,
+    PredictionStatus,
+)
+from src.schemas import DataFormat, DataRead, BatchUploadResult, AnalysisFilterParams, AnalysisParams, AggregateParams, KpiParams, PredictionConfig, PredictionRead
 from src.dependencies import DBSessionDep
-from src.database import Data, Analysis, Prediction
-from src.analysis import create_analysis
-from src.model import create_prediction
+from src.database import Session as DBSession, Blob, Data, Analysis, Prediction
+from src.analysis import ANALYSIS_VERSION, compute_analysis, render_analysis, render_grouped_analysis
+from src.streaming import analyze_columnar
+from src.grouped import compute_grouped_analysis
+from src.model import PREDICTION_VERSION
+from src.jobs import count_unfinished_jobs, enqueue_prediction, fail_interrupted_jobs
+from src.storage import UploadWriter, save_upload
+from src.blobs import store_blob, find_ingested_data, copy_ingested_data, release_blob, release_data_rows
+from src.loader import get_columnar_uri, get_segment_locations, get_rows_owner_id, load_frame, count_columnar_rows
+from src.kpi import load_kpi
+from src.rollups import has_rollups, rebuild_rollups, load_aggregate
+from src.cache import (
+    get_cache_key,
+    find_cached_analysis,
+    get_analysis_content,
+    store_analysis,
+    invalidate_analyses,
+    SingleFlight,
+    find_reusable_prediction,
+    get_prediction_content,
+    invalidate_predictions,
+    remove_report_files,
+)
+from src.workers import WORKER_ID, get_process_pool, shutdown_process_pools, send_heartbeat, remove_worker, remove_gone_workers
+from src.ingest import (
+    ingest_data,
+    convert_pending_data,
+    backfill_rollups,
+    fail_interrupted_ingest,
+    build_columnar,
+    ingest_prepared_data,
+    ingest_record_stream,
+    finalize_record_ingest,
+    append_rows,
+    remove_unused_columnar,
+    get_columnar_files,
+)
+
+logger = logging.getLogger(__name__)
+
+# coalesces identical prediction requests served concurrently by thread pool, keyed by prediction cache key
+prediction_flight = SingleFlight()
+
 
+def run_heartbeat(stop_event: threading.Event) -> None:
+    """Keeps background work of this process from being failed by others and fails work of stopped processes"""
+    while not stop_event.wait(WORKER_HEARTBEAT_INTERVAL):
+        try:
+            send_heartbeat()
+            fail_interrupted_jobs()
+            fail_interrupted_ingest()
+            remove_gone_workers()
+        except Exception as e:
+            logger.warning("Heartbeat failed: %s: %s", type(e).__name__, e)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    send_heartbeat()
+    fail_interrupted_jobs()
+    fail_interrupted_ingest()
+    remove_gone_workers()
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=run_heartbeat, args=(stop_heartbeat,), name="heartbeat", daemon=True).start()
+    threading.Thread(target=backfill_rollups, name="rollup-backfill", daemon=True).start()
+    yield
+    stop_heartbeat.set()
+    shutdown_process_pools()
+    remove_worker()
+
+
+app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory=BASE_DIR / "static", html=True), name="static")
 app.add_middleware(
     CORSMiddleware,
@@ -60,92 +152,622 @@ def get_list_of_models() -> dict[str, list]:
     }
 
 
+def build_data_read(data_obj: Data) -> DataRead:
+    # TODO: тут валидация падает с ошибкой, хотя никакой на этой причины нету и возвращается причем database.object с индексом
+    # data_schema = DataRead.model_validate(data_orm)
+    # поэтому пока такой костыль поставил
+    return DataRead(
+        data_id=data_obj.id,
+        data_type=data_obj.extension,
+        uri_path=data_obj.uri,
+        original_name=data_obj.original_name,
+        size=data_obj.size,
+        content_hash=data_obj.content_hash,
+        row_count=data_obj.row_count,
+        min_date=data_obj.min_date,
+        max_date=data_obj.max_date,
+        status=data_obj.status,
+        status_detail=data_obj.status_detail,
+        created_at=data_obj.created_at,
+        updated_at=data_obj.updated_at,
+    )
+
+
+def build_prediction_read(prediction_obj: Prediction) -> PredictionRead:
+    started_at, finished_at = prediction_obj.started_at, prediction_obj.finished_at
+    return PredictionRead(
+        prediction_id=prediction_obj.id,
+        data_id=prediction_obj.data_id,
+        status=prediction_obj.status,
+        params=prediction_obj.results["params"],
+        uri_path=prediction_obj.uri,
+        error=prediction_obj.error,
+        created_at=prediction_obj.created_at,
+        started_at=started_at,
+        finished_at=finished_at,
+        queue_time=(started_at - prediction_obj.created_at).total_seconds() if started_at else None,
+        run_time=(finished_at - started_at).total_seconds() if started_at and finished_at else None,
+    )
+
+
+def check_data_status(data_obj: Data) -> None:
+    """Data can be read only after conversion into columnar format is finished"""
+    if data_obj.status == DataStatus.PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Данные еще обрабатываются, повторите запрос позже"
+        )
+    if data_obj.status == DataStatus.FAILED:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=data_obj.status_detail,
+        )
+
+
+def ensure_rollups(session: Session, data_obj: Data) -> None:
+    """
+    Datasets skipped by backfill_rollups on startup (or not reached by it yet) get rollups on first request to them,
+    dataset which can't be read is reported as 422 instead of failing the request.
+    """
+    rows_owner_id = get_rows_owner_id(data_obj)
+    if has_rollups(session, rows_owner_id):
+        return
+    try:
+        rebuild_rollups(session, rows_owner_id, load_frame(session, data_obj))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Не удалось прочитать содержимое файла: {e}"
+        )
+
+
+def empty_selection_error(filters: AnalysisFilterParams) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Нет данных за выбранный период и фильтры: {filters.model_dump(mode='json', exclude_none=True)}"
+    )
+
+
+def load_filtered_frame(session: Session, data_obj: Data, filters: AnalysisFilterParams) -> pd.DataFrame:
+    """Load rows of dataset selected by filters, empty selection is reported as 404"""
+    df = load_frame(session, data_obj, **filters.model_dump())
+    if df.empty:
+        raise empty_selection_error(filters)
+    return df
+
+
+def count_selected_rows(session: Session, data_obj: Data, filters: AnalysisFilterParams) -> int:
+    if data_obj.columnar_uri and (BASE_DIR / data_obj.columnar_uri).exists():
+        return count_columnar_rows(BASE_DIR / data_obj.columnar_uri, **filters.model_dump(), segment_locations=get_segment_locations(data_obj))
+    return len(load_frame(session, data_obj, **filters.model_dump()))
+
+
+def compute_data_analysis(session: Session, data_obj: Data, filters: AnalysisFilterParams, max_points: int) -> dict:
+    if data_obj.columnar_uri and (BASE_DIR / data_obj.columnar_uri).exists():
+        results = analyze_columnar(BASE_DIR / data_obj.columnar_uri, max_points, **filters.model_dump(), segment_locations=get_segment_locations(data_obj))
+        if results is None:
+            raise empty_selection_error(filters)
+        return results
+    df = load_filtered_frame(session, data_obj, filters)
+    return compute_analysis(df, max_points)
+
+
+def get_data_analysis(session: Session, data_obj: Data, analysis_params: AnalysisParams) -> tuple[str, bytes]:
+    """Saved analysis of dataset for params, computed and saved on cache miss. Returns (analysis id, content)"""
+    mode = analysis_params.mode
+    filter_params = AnalysisFilterParams(**analysis_params.model_dump(include=set(AnalysisFilterParams.model_fields)))
+    params = analysis_params.model_dump(mode="json")
+    cache_key = get_cache_key(data_obj, params, ANALYSIS_VERSION)
+    cached = find_cached_analysis(session, cache_key)
+    if cached is not None:
+        return cached
+    
+    if analysis_params.grouped:
+        grouped = compute_grouped_analysis(session, data_obj, analysis_params.max_points, **filter_params.model_dump())
+        if not grouped:
+            raise empty_selection_error(filter_params)
+        content = render_grouped_analysis(grouped, mode)
+    else:
+        results = compute_data_analysis(session, data_obj, filter_params, analysis_params.max_points)
+        content = render_analysis(results, mode)
+    analysis_obj = store_analysis(
+        session,
+        data_obj,
+        cache_key,
+        results={"params": params, "version": ANALYSIS_VERSION},
+        content=content,
+        suffix=ANALYSIS_SUFFIXES[mode],
+    )
+    return analysis_obj.id, content
+
+
+def submit_data_prediction(
+    session: Session,
+    data_obj: Data,
+    prediction_config: PredictionConfig,
+    filters: AnalysisFilterParams,
+) -> Prediction:
+    """
+    Prediction of dataset for config and filters: saved or unfinished one with the same cache key,
+    otherwise a new job is queued. Identical concurrent requests are coalesced and get the same job.
+    """
+    params = {**prediction_config.model_dump(mode="json"), **filters.model_dump(mode="json")}
+    cache_key = get_cache_key(data_obj, params, PREDICTION_VERSION)
+    prediction_id = prediction_flight.do(
+        cache_key,
+        lambda: _find_or_enqueue_prediction(session, data_obj, cache_key, params, filters),
+    )
+    return session.get(Prediction, prediction_id)
+
+
+def _find_or_enqueue_prediction(
+    session: Session,
+    data_obj: Data,
+    cache_key: str,
+    params: dict,
+    filters: AnalysisFilterParams,
+) -> str:
+    prediction_obj = find_reusable_prediction(session, cache_key)
+    if prediction_obj is not None:
+        return prediction_obj.id
+    
+    if data_obj.row_count is not None and data_obj.row_count < MIN_PREDICTION_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Недостаточно данных для прогнозирования: необходимо минимум {MIN_PREDICTION_ROWS} записей, загружено {data_obj.row_count}"
+        )
+    
+    selected_rows = count_selected_rows(session, data_obj, filters)
+    if selected_rows < MIN_PREDICTION_ROWS:
+        if selected_rows == 0:
+            raise empty_selection_error(filters)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Недостаточно данных для прогнозирования: необходимо минимум {MIN_PREDICTION_ROWS} записей, выбрано {selected_rows}"
+        )
+    
+    if count_unfinished_jobs(session) >= PREDICTION_MAX_QUEUED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Очередь прогнозирования заполнена ({PREDICTION_MAX_QUEUED} задач), повторите запрос позже"
+        )
+    prediction_obj = enqueue_prediction(session, data_obj, cache_key, results={"params": params, "version": PREDICTION_VERSION})
+    return prediction_obj.id
+
+
+def prewarm_data(data_id: str) -> None:
+    """
+    Background task run after upload with prewarm=true: default analysis and PREWARM_PREDICTIONS of dataset
+    are computed and saved, so first interactive requests are served from cache.
+    Failures are logged and don't affect the dataset.
+    """
+    with DBSession() as session:
+        data_obj = session.get(Data, data_id)
+        # excel datasets are prewarmed after background conversion, which may have failed
+        if data_obj is None or data_obj.status != DataStatus.READY:
+            return
+        try:
+            get_data_analysis(session, data_obj, AnalysisParams())
+        except Exception:
+            session.rollback()
+            logger.exception("Prewarm analysis of data %s failed", data_id)
+        for model_type, forecast_horizon in PREWARM_PREDICTIONS:
+            prediction_config = PredictionConfig(model_type=model_type, forecast_horizon=forecast_horizon)
+            try:
+                # models are fitted by prediction workers, prewarm only queues the jobs
+                submit_data_prediction(session, data_obj, prediction_config, AnalysisFilterParams())
+            except Exception:
+                session.rollback()
+                logger.exception("Prewarm %s prediction of data %s failed", model_type.value, data_id)
+
+
+def check_upload_file(file_object: StarletteUploadFile) -> FileType:
+    """Check uploaded file type and size, returns file type"""
+    if file_object.content_type not in [FileMimeType.CSV, FileMimeType.JSON, FileMimeType.EXCEL]:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Допустимые форматы файла: csv, json, excel"
+        )
+    suffix = (file_object.filename or "").split(".")[-1].lower()
+    file_types = {FILE_SUFFIXES[file_type]: file_type for file_type in (FileType.CSV, FileType.JSON, FileType.EXCEL)}
+    if suffix not in file_types:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Допустимые расширения файла: .csv, .json, .xlsx. Расширение файла должно быть указано в названии файла"
+        )
+    
+    if file_object.size is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Нельзя загружать пустой файл"
+        )
+    if file_object.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Размер файла превышает допустимый лимит в {MAX_UPLOAD_SIZE} байт"
+        )
+    return file_types[suffix]
+
+
 @app.post(
     "/data/upload",
     description="""
 - Загрузка файла формата .CSV, .JSON, .EXCEL с данными для анализа
-- Либо загрузка данных вручную через body в формате JSON
-- Обязательный формат данных указан в схеме FileFormat
+- Загрузка данных через body в формате JSON / NDJSON - через /data/upload/records
+- Обязательный формат данных указан в схеме DataFormat
+- prewarm=true - после загрузки в фоне рассчитываются анализ с параметрами по умолчанию и прогнозы из PREWARM_PREDICTIONS
     """
 )
 def upload_data(
     session: DBSessionDep,
-    file_object: UploadFile, # | None = None,
-    # file_body: DataFormat | None = None,
+    file_object: UploadFile,
+    background_tasks: BackgroundTasks,
+    max_errors: Annotated[int, Query(ge=1, le=1000, description="Проверка содержимого файла останавливается после указанного количества ошибок")] = VALIDATION_MAX_ERRORS,
+    prewarm: Annotated[bool, Query(description="Рассчитать анализ и прогнозы по умолчанию в фоне после загрузки")] = False,
 ) -> DataRead:
-    # if not (bool(file_object) or bool(file_body)):
-    #     raise HTTPException(
-    #         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-    #         detail="Необходимо загрузить хотя бы один из параметров: file_object или file_body"
-    #     )
-    
-    # if file_body and file_object: # TODO: refactor it, so it will be possible to upload both file and body
-    #     raise HTTPException(
-    #         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-    #         detail="Нельзя одновременно загружать file_object или file_body - только одно из них за раз"
-    #     )
-    
     if file_object:
-        if file_object.content_type not in [FileMimeType.CSV, FileMimeType.JSON, FileMimeType.EXCEL]:
-            raise HTTPException(
-                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-                detail="Допустимые форматы файла: csv, json, excel"
-            )
-        if not file_object.filename.endswith((FileType.CSV, FileType.JSON, FileType.EXCEL)):
-            raise HTTPException(
-                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-                detail="Допустимые расширения файла: .csv, .json, .xlsx. Расширение файла должно быть указано в названии файла"
-            )
-        
-        if file_object.size is None:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="Нельзя загружать пустой файл"
-            )
-        
-        original_file_name = file_object.filename
-        new_file_name = str(uuid4())
-        extension = file_object.filename.split(".")[-1]
-        file_uri = f"static/data/{new_file_name}.{extension}"
-        file_location = BASE_DIR / file_uri
-        file_size = file_object.size
-        with open(file_location, "wb+") as file_data:
-            file_data.write(file_object.file.read())
+        extension = check_upload_file(file_object)
+        writer = UploadWriter(DATA_DIR)
+        try:
+            writer.copy_from(file_object.file)
+            blob, is_new_blob = store_blob(session, writer, extension)
+        except BaseException:
+            writer.abort()
+            raise
+        # blob row of new file is gone after rollback, its file is removed by saved uri
+        blob_uri = blob.uri
         
         stmt = (
             insert(Data)
             .values(
-                id=new_file_name,
-                uri=file_uri,
+                id=str(uuid4()),
+                uri=blob.uri,
                 extension=extension,
-                original_name=original_file_name,
-                size=file_size,
+                original_name=file_object.filename,
+                size=blob.size,
+                content_hash=blob.id,
+                blob_id=blob.id,
             )
             .returning(Data)
         )
         insert_data = session.execute(stmt)
         data_obj = insert_data.scalar_one_or_none()
+        
+        # the same bytes were already uploaded and parsed - reuse results instead of parsing again
+        ingested_data = find_ingested_data(session, blob.id)
+        if ingested_data is not None:
+            copy_ingested_data(session, ingested_data, data_obj)
+            session.commit()
+            if prewarm:
+                background_tasks.add_task(prewarm_data, data_obj.id)
+            return build_data_read(data_obj)
+        
+        # excel parsing is slow, so it's converted after response - until then data has PENDING status
+        if extension == FileType.EXCEL:
+            data_obj.status = DataStatus.PENDING
+            data_obj.worker_id = WORKER_ID
+            session.commit()
+            background_tasks.add_task(convert_pending_data, data_obj.id, max_errors)
+            # background tasks run in order, so prewarm sees converted data
+            if prewarm:
+                background_tasks.add_task(prewarm_data, data_obj.id)
+            return build_data_read(data_obj)
+        
+        try:
+            report = ingest_data(session, data_obj, max_errors=max_errors)
+        except Exception as e:
+            session.rollback()
+            if is_new_blob:
+                (BASE_DIR / blob_uri).unlink(missing_ok=True)
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Не удалось прочитать содержимое файла: {e}"
+            )
+        if not report.valid:
+            session.rollback()
+            if is_new_blob:
+                (BASE_DIR / blob_uri).unlink(missing_ok=True)
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=report.model_dump(mode="json"),
+            )
         session.commit()
+        if prewarm:
+            background_tasks.add_task(prewarm_data, data_obj.id)
         
-        # TODO: тут валидация падает с ошибкой, хотя никакой на этой причины нету и возвращается причем database.object с индексом
-        # data_schema = DataRead.model_validate(data_orm)
-        # поэтому пока такой костыль поставил
-        data_schema = DataRead(
-            data_id=data_obj.id,
-            data_type=extension,
-            uri_path=data_obj.uri,
-            original_name=data_obj.original_name,
-            size=data_obj.size,
-            created_at=data_obj.created_at,
-            updated_at=data_obj.updated_at,
-        )
-    
-    # if file_body:
-    #     pass
+        data_schema = build_data_read(data_obj)
 
     return data_schema
 
 
+@app.post(
+    "/data/upload/batch",
+    description="""
+- Загрузка нескольких файлов .CSV, .JSON, .EXCEL за один запрос
+- Файлы сохраняются последовательно, а проверка и преобразование выполняются параллельно в пуле процессов
+- Результат и ошибка возвращаются по каждому файлу отдельно, ошибка одного файла не отменяет загрузку остальных
+    """
+)
+def upload_data_batch(
+    session: DBSessionDep,
+    file_objects: list[UploadFile],
+    max_errors: Annotated[int, Query(ge=1, le=1000, description="Проверка содержимого файла останавливается после указанного количества ошибок")] = VALIDATION_MAX_ERRORS,
+) -> list[BatchUploadResult]:
+    if len(file_objects) > MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Можно загрузить не более {MAX_BATCH_FILES} файлов за раз"
+        )
+    
+    results = [BatchUploadResult(original_name=file_object.filename or "") for file_object in file_objects]
+    stored_blobs: dict[int, tuple[Blob, str]] = {}
+    for i, file_object in enumerate(file_objects):
+        try:
+            extension = check_upload_file(file_object)
+            writer = UploadWriter(DATA_DIR)
+            try:
+                writer.copy_from(file_object.file)
+                blob, _ = store_blob(session, writer, extension)
+            except BaseException:
+                writer.abort()
+                raise
+        except HTTPException as e:
+            results[i].error = e.detail
+            continue
+        session.commit()
+        stored_blobs[i] = (blob, extension)
+    
+    # identical files are converted once, files already known by content hash are not converted at all
+    pool = get_process_pool("ingest", INGEST_WORKERS)
+    conversions = {}
+    for blob, extension in stored_blobs.values():
+        if blob.id in conversions or find_ingested_data(session, blob.id) is not None:
+            continue
+        conversions[blob.id] = pool.submit(build_columnar, blob.uri, extension, blob.id, max_errors)
+    
+    for i, (blob, extension) in stored_blobs.items():
+        data_obj = Data(
+            id=str(uuid4()),
+            uri=blob.uri,
+            extension=extension,
+            original_name=file_objects[i].filename,
+            size=blob.size,
+            content_hash=blob.id,
+            blob_id=blob.id,
+        )
+        session.add(data_obj)
+        ingested_data = find_ingested_data(session, blob.id)
+        if ingested_data is not None:
+            copy_ingested_data(session, ingested_data, data_obj)
+            session.commit()
+            results[i].data = build_data_read(data_obj)
+            continue
+        
+        try:
+            report = conversions[blob.id].result()
+        except Exception as e:
+            report = None
+            results[i].error = f"Не удалось прочитать содержимое файла: {e}"
+        if report is not None and report.valid:
+            ingest_prepared_data(session, data_obj, report)
+            session.commit()
+            results[i].data = build_data_read(data_obj)
+            continue
+        
+        if report is not None:
+            results[i].error = report.model_dump(mode="json")
+        session.rollback()
+        unused_file_uri = release_blob(session, blob.id)
+        session.commit()
+        if unused_file_uri:
+            (BASE_DIR / unused_file_uri).unlink(missing_ok=True)
+    return results
+
+
+@app.post(
+    "/data/upload/records",
+    description="""
+- Потоковая загрузка записей в формате DataFormat через body
+- Content-Type: application/x-ndjson (одна запись JSON на строку) или application/json (массив записей)
+- Записи проверяются и сохраняются пачками по мере получения, без чтения всего body в память
+    """
+)
+async def upload_records(
+    request: Request,
+    session: DBSessionDep,
+    max_errors: Annotated[int, Query(ge=1, le=1000, description="Проверка записей останавливается после указанного количества ошибок")] = VALIDATION_MAX_ERRORS,
+) -> DataRead:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == FileMimeType.NDJSON:
+        extension = FileType.NDJSON
+    elif content_type == FileMimeType.JSON:
+        extension = FileType.JSON
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Допустимые форматы body: application/x-ndjson, application/json"
+        )
+    
+    data_obj = Data(
+        id=str(uuid4()),
+        uri="",
+        extension=extension,
+        original_name=f"records.{FILE_SUFFIXES[extension]}",
+        size=0,
+    )
+    session.add(data_obj)
+    writer = UploadWriter(DATA_DIR)
+    # blob stored by this request and its columnar artifact, referenced by nobody after rollback
+    new_file_uris = []
+    
+    def discard() -> None:
+        writer.abort()
+        session.rollback()
+        for uri in new_file_uris:
+            (BASE_DIR / uri).unlink(missing_ok=True)
+    
+    try:
+        report = await ingest_record_stream(
+            session,
+            data_obj,
+            request.stream(),
+            writer,
+            is_array=extension == FileType.JSON,
+            max_errors=max_errors,
+        )
+        if not report.valid:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=report.model_dump(mode="json"),
+            )
+        blob, is_new_blob = await run_in_threadpool(store_blob, session, writer, extension)
+        if is_new_blob:
+            new_file_uris += [blob.uri, get_columnar_uri(blob.id)]
+        data_obj.uri = blob.uri
+        data_obj.size = blob.size
+        data_obj.content_hash = blob.id
+        data_obj.blob_id = blob.id
+        await run_in_threadpool(finalize_record_ingest, session, data_obj)
+        await run_in_threadpool(session.commit)
+    except ValueError as e:
+        await run_in_threadpool(discard)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e),
+        )
+    except BaseException:
+        await run_in_threadpool(discard)
+        raise
+    return build_data_read(data_obj)
+
+
+@app.post(
+    "/data/{data_id}/append",
+    description="""
+- Добавить записи к существующим данным без повторной загрузки всего файла
+- Файл .CSV, .JSON, .EXCEL через multipart/form-data (поле file_object), либо body application/x-ndjson / application/json
+- Записи с уже существующей парой (object_name, date) заменяют старые
+- Скачивание данных по идентификатору по-прежнему возвращает изначально загруженный файл
+    """
+)
+async def append_data(
+    data_id: UUID,
+    request: Request,
+    session: DBSessionDep,
+    max_errors: Annotated[int, Query(ge=1, le=1000, description="Проверка записей останавливается после указанного количества ошибок")] = VALIDATION_MAX_ERRORS,
+) -> DataRead:
+    stmt = select(Data).where(Data.id == str(data_id))
+    select_data = session.execute(stmt)
+    data_obj = select_data.scalar_one_or_none()
+    if not data_obj:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Данные по идентификатору не найдены"
+        )
+    
+    check_data_status(data_obj)
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "multipart/form-data":
+        form = await request.form()
+        file_object = form.get("file_object")
+        if not isinstance(file_object, StarletteUploadFile):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Необходимо передать файл в поле file_object"
+            )
+        extension = check_upload_file(file_object)
+        file_location = BASE_DIR / f"static/data/{uuid4()}.{FILE_SUFFIXES[extension]}"
+        stored_file = await run_in_threadpool(save_upload, file_object.file, file_location)
+    elif content_type in (FileMimeType.NDJSON, FileMimeType.JSON):
+        extension = FileType.NDJSON if content_type == FileMimeType.NDJSON else FileType.JSON
+        file_location = BASE_DIR / f"static/data/{uuid4()}.{FILE_SUFFIXES[extension]}"
+        writer = UploadWriter(file_location.parent)
+        try:
+            async for chunk in request.stream():
+                await run_in_threadpool(writer.write, chunk)
+            stored_file = await run_in_threadpool(writer.commit, file_location)
+        except BaseException:
+            writer.abort()
+            raise
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Допустимые форматы: multipart/form-data, application/x-ndjson, application/json"
+        )
+    
+    previous_columnar_files = get_columnar_files(data_obj)
+    try:
+        report = await run_in_threadpool(append_rows, session, data_obj, stored_file, extension, max_errors)
+    except HTTPException:
+        session.rollback()
+        raise
+    except Exception as e:
+        session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Не удалось прочитать содержимое файла: {e}"
+        )
+    finally:
+        stored_file.path.unlink(missing_ok=True)
+    if not report.valid:
+        session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=report.model_dump(mode="json"),
+        )
+    # artifact or segment written by this append
+    new_columnar_uri = get_columnar_uri(data_obj.content_hash)
+    try:
+        report_uris = invalidate_analyses(session, data_obj.id) + invalidate_predictions(
+            session, data_obj.id, "Прогнозирование отменено: данные были изменены"
+        )
+        await run_in_threadpool(session.commit)
+    except BaseException:
+        session.rollback()
+        (BASE_DIR / new_columnar_uri).unlink(missing_ok=True)
+        raise
+    # compaction replaces previous artifact and segments
+    remove_unused_columnar(session, [uri for uri in previous_columnar_files if uri not in get_columnar_files(data_obj)])
+    remove_report_files(report_uris)
+    return build_data_read(data_obj)
+
+
+@app.delete(
+    "/data/{data_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Удалить данные по идентификатору, файл удаляется когда на него больше не ссылаются другие данные"
+)
+def delete_data(
+    session: DBSessionDep,
+    data_id: UUID,
+) -> None:
+    stmt = select(Data).where(Data.id == str(data_id))
+    select_data = session.execute(stmt)
+    data_obj = select_data.scalar_one_or_none()
+    if not data_obj:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Данные по идентификатору не найдены"
+        )
+    
+    columnar_files = get_columnar_files(data_obj)
+    # datasets uploaded before blobs were introduced own their file
+    unused_file_uri = release_blob(session, data_obj.blob_id) if data_obj.blob_id else data_obj.uri
+    release_data_rows(session, data_obj)
+    report_uris = invalidate_analyses(session, data_obj.id) + invalidate_predictions(
+        session, data_obj.id, "Прогнозирование отменено: данные удалены"
+    )
+    session.delete(data_obj)
+    session.commit()
+    
+    if unused_file_uri:
+        (BASE_DIR / unused_file_uri).unlink(missing_ok=True)
+    remove_unused_columnar(session, columnar_files)
+    remove_report_files(report_uris)
+
+
 @app.get(
     "/data/{data_id}",
     status_code=status.HTTP_200_OK,
@@ -168,13 +790,19 @@ def get_data(
 
 
 @app.get(
-    "/data/{data_id}/analysis",
-    description="Запустить анализ данных по идентификатору"
+    "/data/{data_id}/aggregate",
+    description="""
+    Агрегированные значения показателей по объектам и периодам (день, неделя, месяц)
+    - Считаются по заранее подготовленным дневным и месячным агрегатам, исходные почасовые записи не читаются
+    - Периоды, пересекающиеся с start_date - end_date, входят целиком
+    - Колонки результата: object_name, period и <показатель>_<функция> для каждой функции из agg
+    """
 )
-def get_analysis(
+def get_aggregate(
     data_id: UUID,
     session: DBSessionDep,
-) -> HTMLResponse:
+    aggregate_params: Annotated[AggregateParams, Query()],
+) -> Response:
     stmt = select(Data).where(Data.id == str(data_id))
     select_data = session.execute(stmt)
     data_obj = select_data.scalar_one_or_none()
@@ -184,31 +812,147 @@ def get_analysis(
             detail="Данные по идентификатору не найдены"
         )
     
-    with open(BASE_DIR / data_obj.uri, "rb") as file:
-        file_io_data = io.BytesIO(file.read())
+    check_data_status(data_obj)
+    ensure_rollups(session, data_obj)
+    
+    filter_params = AnalysisFilterParams(**aggregate_params.model_dump(include=set(AnalysisFilterParams.model_fields)))
+    df = load_aggregate(
+        session,
+        get_rows_owner_id(data_obj),
+        aggregate_params.freq,
+        aggregate_params.functions,
+        **filter_params.model_dump(),
+    )
+    if df.empty:
+        raise empty_selection_error(filter_params)
+    
+    df["period"] = df["period"].dt.strftime("%Y-%m-%d")
+    content = orjson.dumps({
+        "freq": aggregate_params.freq.value,
+        "rows": df.to_dict("records"),
+    })
+    return Response(content=content, media_type="application/json")
+
+
+@app.get(
+    "/kpi",
+    description="""
+    Показатели отклонения факта от плана по объектам и периодам (день, неделя, месяц)
+    - По умолчанию по всем готовым наборам данных, наборы с одинаковым содержимым учитываются один раз
+    - Считаются по заранее подготовленным дневным агрегатам, исходные почасовые записи не читаются
+    - Учитываются часы, где есть и план, и факт
+    - deviation - небаланс (факт - план), abs_deviation - сумма модулей отклонений
+    - pct_deviation - abs_deviation в процентах от факта, bias - среднее отклонение, mape - средняя ошибка в процентах (часы с нулевым фактом не учитываются)
+    - by_object=false - суммарно по всем объектам
+    - Периоды, пересекающиеся с start_date - end_date, входят целиком
+    """
+)
+def get_kpi(
+    session: DBSessionDep,
+    kpi_params: Annotated[KpiParams, Query()],
+) -> Response:
+    if kpi_params.data_id is not None:
+        data_obj = session.get(Data, str(kpi_params.data_id))
+        if not data_obj:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Данные по идентификатору не найдены"
+            )
+        check_data_status(data_obj)
+        ensure_rollups(session, data_obj)
+    # without data_id only rollups are read, old datasets get them by backfill_rollups on startup
+    
+    filter_params = AnalysisFilterParams(**kpi_params.model_dump(include=set(AnalysisFilterParams.model_fields)))
+    df = load_kpi(
+        session,
+        kpi_params.freq,
+        by_object=kpi_params.by_object,
+        data_id=get_rows_owner_id(data_obj) if kpi_params.data_id is not None else None,
+        **filter_params.model_dump(),
+    )
+    if df.empty:
+        raise empty_selection_error(filter_params)
     
-    if data_obj.extension == FileType.CSV:
-        df = pd.read_csv(file_io_data, parse_dates=["date"]) # parse_dates=['date'] index_col='date', 
-    elif data_obj.extension == FileType.JSON:
-        df = pd.read_json(file_io_data, parse_dates=["date"]) # parse_dates=['date'] index_col='date',
-    elif data_obj.extension == FileType.EXCEL:
-        df = pd.read_excel(file_io_data, parse_dates=["date"]) # parse_dates=['date'] index_col='date', 
+    content = orjson.dumps({
+        "freq": kpi_params.freq.value,
+        "rows": df.to_dict("records"),
+    })
+    return Response(content=content, media_type="application/json")
+
+
+@app.get(
+    "/data/{data_id}/analysis",
+    description="""
+    Запустить анализ данных по идентификатору
+    - mode=html - отчет plotly, mode=json - массивы в json, mode=binary - массивы в base64 (little-endian)
+    - График план/факт прореживается до max_points точек (LTTB), max_points=0 - без прореживания
+    - Очень большие выборки обрабатываются по частям, график план/факт для них прореживается всегда
+    - grouped=true - анализ для каждого объекта отдельно (параллельно), в json результаты по ключу objects
+    - Результат сохраняется и повторно используется, пока данные не изменятся
+    - Идентификатор сохраненного анализа возвращается в заголовке X-Analysis-Id
+    - Данные можно ограничить объектом (object_name) и периодом (start_date, end_date включительно)
+    """
+)
+def get_analysis(
+    data_id: UUID,
+    session: DBSessionDep,
+    analysis_params: Annotated[AnalysisParams, Query()],
+) -> Response:
+    stmt = select(Data).where(Data.id == str(data_id))
+    select_data = session.execute(stmt)
+    data_obj = select_data.scalar_one_or_none()
+    if not data_obj:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Данные по идентификатору не найдены"
+        )
     
-    html_content = create_analysis(df=df)
+    check_data_status(data_obj)
+    analysis_id, content = get_data_analysis(session, data_obj, analysis_params)
+    return Response(
+        content=content,
+        media_type=ANALYSIS_MEDIA_TYPES[analysis_params.mode],
+        headers={"X-Analysis-Id": str(analysis_id)},
+    )
+
+
+@app.get(
+    "/analysis/{analysis_id}",
+    description="Получить сохраненный результат анализа по идентификатору"
+)
+def get_saved_analysis(
+    analysis_id: UUID,
+    session: DBSessionDep,
+) -> Response:
+    analysis_obj = session.get(Analysis, str(analysis_id))
+    content = get_analysis_content(analysis_obj) if analysis_obj else None
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Анализ по идентификатору не найден"
+        )
     
-    return HTMLResponse(content=html_content)
+    mode = AnalysisMode(analysis_obj.results["params"].get("mode", AnalysisMode.HTML))
+    return Response(content=content, media_type=ANALYSIS_MEDIA_TYPES[mode])
 
 
 @app.post(
     "/data/{data_id}/predictions/run",
-    status_code=status.HTTP_201_CREATED,
-    description="Запустить прогнозирование данных на одной из доступной модели"
+    status_code=status.HTTP_202_ACCEPTED,
+    description="""
+    Поставить прогнозирование данных на одной из доступной модели в очередь
+    - Модель обучается в отдельном процессе, состояние задачи - через GET /predictions/{prediction_id}
+    - Данные для обучения можно ограничить объектом (object_name) и периодом (start_date, end_date включительно)
+    - Результат сохраняется и повторно используется, пока данные не изменятся - тогда сразу возвращается задача в статусе succeeded
+    - Одинаковые запросы, пока задача в очереди или выполняется, получают ту же задачу, модель повторно не обучается
+    """
 )
 def run_prediction(
     data_id: UUID,
     prediction_config: PredictionConfig,
     session: DBSessionDep,
-) -> HTMLResponse:
+    filter_params: Annotated[AnalysisFilterParams, Query()],
+) -> PredictionRead:
     stmt = select(Data).where(Data.id == str(data_id))
     select_data = session.execute(stmt)
     data_obj = select_data.scalar_one_or_none()
@@ -218,27 +962,55 @@ def run_prediction(
             detail="Данные по идентификатору не найдены"
         )
     
-    with open(BASE_DIR / data_obj.uri, "rb") as file:
-        file_io_data = io.BytesIO(file.read())
-    
-    if data_obj.extension == FileType.CSV:
-        df = pd.read_csv(file_io_data, parse_dates=["date"]) # parse_dates=['date'] index_col='date', 
-    elif data_obj.extension == FileType.JSON:
-        df = pd.read_json(file_io_data, parse_dates=["date"]) # parse_dates=['date'] index_col='date',
-    elif data_obj.extension == FileType.EXCEL:
-        df = pd.read_excel(file_io_data, parse_dates=["date"]) # parse_dates=['date'] index_col='date', 
-    
-    html_content = create_prediction(
-        df=df,
-        model_type=prediction_config.model_type,
-        forecast_horizon=prediction_config.forecast_horizon,
-    )
-    
-    return HTMLResponse(content=html_content)
+    check_data_status(data_obj)
+    prediction_obj = submit_data_prediction(session, data_obj, prediction_config, filter_params)
+    return build_prediction_read(prediction_obj)
 
 
-# @app.get(
-#     "/predictions/{prediction_id}",
-# )
-# def get_prediction(prediction_id: UUID):
-#     pass
+@app.get(
+    "/predictions/{prediction_id}",
+    description="""
+    Состояние задачи прогнозирования: queued, running, succeeded, failed
+    - Время ожидания в очереди и расчета, причина ошибки для failed
+    - Отчет успешного прогноза доступен по uri_path и через GET /predictions/{prediction_id}/report
+    """
+)
+def get_prediction(
+    prediction_id: UUID,
+    session: DBSessionDep,
+) -> PredictionRead:
+    prediction_obj = session.get(Prediction, str(prediction_id))
+    if not prediction_obj:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Прогноз по идентификатору не найден"
+        )
+    return build_prediction_read(prediction_obj)
+
+
+@app.get(
+    "/predictions/{prediction_id}/report",
+    description="Получить отчет успешно завершенного прогноза"
+)
+def get_prediction_report(
+    prediction_id: UUID,
+    session: DBSessionDep,
+) -> HTMLResponse:
+    prediction_obj = session.get(Prediction, str(prediction_id))
+    if not prediction_obj:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Прогноз по идентификатору не найден"
+        )
+    if prediction_obj.status != PredictionStatus.SUCCEEDED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Прогноз не завершен успешно, статус: {prediction_obj.status}"
+        )
+    content = get_prediction_content(prediction_obj)
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Отчет прогноза не найден"
+        )
+    return HTMLResponse(content=content)
@@ -0,0 +1,133 @@
+from sqlalchemy import select, insert, update, delete, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.constants import DATA_DIR, FILE_SUFFIXES, FileType
+from src.database import Blob, Data, DataPoint, DataRollup, KpiRollup
+from src.loader import get_rows_owner_id
+from src.normalization import MEASURE_COLUMNS, CATEGORY_COLUMNS
+from src.rollups import copy_rollups
+from src.storage import UploadWriter
+
+
+def store_blob(session: Session, writer: UploadWriter, extension: FileType) -> tuple[Blob, bool]:
+    """
+    Finish upload as content addressed blob static/data/<sha256>.<suffix> and take reference on it.
+    If the same bytes are already stored, written copy is discarded.
+    Returns blob and flag whether file was stored by this call.
+    """
+    digest = writer.digest.hexdigest()
+    file_name = f"{digest}.{FILE_SUFFIXES[extension]}"
+    is_new = session.get(Blob, digest) is None
+    if is_new:
+        writer.commit(DATA_DIR / file_name)
+    else:
+        writer.abort()
+    stmt = (
+        sqlite_insert(Blob)
+        .values(
+            id=digest,
+            uri=f"static/data/{file_name}",
+            extension=extension.value,
+            size=writer.size,
+            ref_count=1,
+        )
+        .on_conflict_do_update(index_elements=[Blob.id], set_={"ref_count": Blob.ref_count + 1})
+    )
+    session.execute(stmt)
+    blob = session.get(Blob, digest, populate_existing=True)
+    return blob, is_new
+
+
+def find_ingested_data(session: Session, content_hash: str) -> Data | None:
+    """Find dataset with the same content which derived artifacts can be reused"""
+    stmt = (
+        select(Data)
+        .where(Data.content_hash == content_hash)
+        .where(Data.columnar_uri.is_not(None))
+        .where(Data.row_count.is_not(None))
+        .limit(1)
+    )
+    return session.execute(stmt).scalar_one_or_none()
+
+
+def copy_ingested_data(session: Session, source: Data, target: Data) -> None:
+    """Point target to derived artifacts of source, data_point and rollup rows of source are shared, not copied"""
+    target.columnar_uri = source.columnar_uri
+    target.columnar_segments = source.columnar_segments
+    target.row_count = source.row_count
+    target.min_date = source.min_date
+    target.max_date = source.max_date
+    target.rows_owner_id = get_rows_owner_id(source)
+
+
+def copy_data_rows(session: Session, source_id: str, target_id: str) -> None:
+    """Copy data_point and rollup rows stored under source_id to target_id inside database"""
+    columns = ["ts", *CATEGORY_COLUMNS, *MEASURE_COLUMNS]
+    stmt = insert(DataPoint).from_select(
+        ["data_id", *columns],
+        select(literal(target_id), *(getattr(DataPoint, col) for col in columns)).where(DataPoint.data_id == source_id),
+    )
+    session.execute(stmt)
+    copy_rollups(session, source_id, target_id)
+
+
+def _get_sharing_data_ids(session: Session, data_obj: Data) -> list[str]:
+    """Datasets which use data_point and rollup rows owned by data_obj"""
+    return session.execute(select(Data.id).where(Data.rows_owner_id == data_obj.id).order_by(Data.id)).scalars().all()
+
+
+def _set_rows_owner(session: Session, owner_id: str, new_owner_id: str) -> None:
+    session.execute(
+        update(Data)
+        .where(Data.rows_owner_id == owner_id)
+        .where(Data.id != new_owner_id)
+        .values(rows_owner_id=new_owner_id)
+    )
+    session.execute(update(Data).where(Data.id == new_owner_id).values(rows_owner_id=None))
+
+
+def release_data_rows(session: Session, data_obj: Data) -> None:
+    """
+    Drop data_point and rollup rows of deleted dataset, rows shared with other datasets are kept:
+    if data_obj owns them, they are moved under one of the datasets using them.
+    """
+    if data_obj.rows_owner_id is not None:
+        return
+    sharing_ids = _get_sharing_data_ids(session, data_obj)
+    if not sharing_ids:
+        for model in (DataPoint, DataRollup, KpiRollup):
+            session.execute(delete(model).where(model.data_id == data_obj.id))
+        return
+    for model in (DataPoint, DataRollup, KpiRollup):
+        session.execute(update(model).where(model.data_id == data_obj.id).values(data_id=sharing_ids[0]))
+    _set_rows_owner(session, data_obj.id, sharing_ids[0])
+
+
+def detach_data_rows(session: Session, data_obj: Data) -> None:
+    """
+    Give data_obj its own data_point and rollup rows before they are changed (copy on write),
+    datasets sharing them keep the unchanged ones. Does nothing if rows aren't shared.
+    """
+    if data_obj.rows_owner_id is not None:
+        copy_data_rows(session, data_obj.rows_owner_id, data_obj.id)
+        data_obj.rows_owner_id = None
+        return
+    sharing_ids = _get_sharing_data_ids(session, data_obj)
+    if sharing_ids:
+        copy_data_rows(session, data_obj.id, sharing_ids[0])
+        _set_rows_owner(session, data_obj.id, sharing_ids[0])
+
+
+def release_blob(session: Session, blob_id: str | None) -> str | None:
+    """Drop one reference on blob, returns uri of blob file if nothing refers to it anymore and it should be removed"""
+    if blob_id is None:
+        return None
+    blob = session.get(Blob, blob_id)
+    if blob is None:
+        return None
+    blob.ref_count -= 1
+    if blob.ref_count > 0:
+        return None
+    session.execute(delete(Blob).where(Blob.id == blob_id))
+    return blob.uri
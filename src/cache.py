@@ -0,0 +1,283 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Callable, Hashable
+from uuid import uuid4
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.orm import Session
+
+from src.constants import (
+    BASE_DIR,
+    ANALYSIS_CACHE_SIZE,
+    ANALYSIS_CACHE_MAX_BYTES,
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_MAX_BYTES,
+    UNFINISHED_PREDICTION_STATUSES,
+    PredictionStatus,
+)
+from src.database import Data, Analysis, Prediction
+
+
+class LRUCache:
+    """
+    Thread safe least recently used cache bounded by number of entries and total weight of values.
+    Shared by requests served from thread pool of API process.
+    """
+
+    def __init__(self, max_size: int, max_weight: int | None = None, weigh: Callable[[Any], int] = len):
+        self.max_size = max_size
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.weight = 0
+        self._items: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        weight = self.weigh(value) if self.max_weight is not None else 0
+        # value which doesn't fit at all would only flush the whole cache
+        if self.max_size <= 0 or (self.max_weight is not None and weight > self.max_weight):
+            return
+        with self._lock:
+            self._pop(key)
+            self._items[key] = (value, weight)
+            self.weight += weight
+            while len(self._items) > self.max_size or (self.max_weight is not None and self.weight > self.max_weight):
+                _, (_, evicted_weight) = self._items.popitem(last=False)
+                self.weight -= evicted_weight
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.weight = 0
+
+    def _pop(self, key: Hashable) -> None:
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.weight -= item[1]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with equal key: the first caller runs the function,
+    callers arriving while it runs wait for it and get the same result or exception.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = Future()
+        if not is_leader:
+            return call.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+# cache_key -> (analysis id, content)
+analysis_cache = LRUCache(
+    max_size=ANALYSIS_CACHE_SIZE,
+    max_weight=ANALYSIS_CACHE_MAX_BYTES,
+    weigh=lambda item: len(item[1]),
+)
+
+# cache_key -> (prediction id, report content) of succeeded predictions
+prediction_cache = LRUCache(
+    max_size=PREDICTION_CACHE_SIZE,
+    max_weight=PREDICTION_CACHE_MAX_BYTES,
+    weigh=lambda item: len(item[1]),
+)
+
+
+def get_cache_key(data_obj: Data, params: dict, version: int) -> str:
+    """
+    Analyses and predictions depend only on parsed content, so datasets with equal content share cached results.
+    Datasets uploaded before content hashing was introduced are keyed by their id.
+    """
+    content_key = data_obj.content_hash or f"data:{data_obj.id}"
+    payload = json.dumps([content_key, params, version], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _read_file(obj: Analysis | Prediction) -> bytes | None:
+    if not obj.uri:
+        return None
+    try:
+        return (BASE_DIR / obj.uri).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def _save_with_file(session: Session, obj: Analysis | Prediction, content: bytes) -> None:
+    """Add row and write its content to obj.uri, file is removed again if commit fails"""
+    session.add(obj)
+    file_location = BASE_DIR / obj.uri
+    tmp_location = file_location.with_name(f"{file_location.name}.tmp")
+    tmp_location.write_bytes(content)
+    tmp_location.replace(file_location)
+    try:
+        session.commit()
+    except BaseException:
+        file_location.unlink(missing_ok=True)
+        raise
+
+
+def find_cached_analysis(session: Session, cache_key: str) -> tuple[str, bytes] | None:
+    """Look up analysis in memory, then in analysis table. Returns (analysis id, content) or None"""
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    stmt = (
+        select(Analysis)
+        .where(Analysis.cache_key == cache_key)
+        .order_by(Analysis.created_at.desc())
+        .limit(1)
+    )
+    analysis_obj = session.execute(stmt).scalar_one_or_none()
+    if analysis_obj is None:
+        return None
+    content = _read_file(analysis_obj)
+    if content is None:
+        # report file is gone, row is stale
+        session.delete(analysis_obj)
+        session.commit()
+        return None
+    cached = (analysis_obj.id, content)
+    analysis_cache.put(cache_key, cached)
+    return cached
+
+
+def get_analysis_content(analysis_obj: Analysis) -> bytes | None:
+    if analysis_obj.cache_key:
+        cached = analysis_cache.get(analysis_obj.cache_key)
+        if cached is not None and cached[0] == analysis_obj.id:
+            return cached[1]
+    return _read_file(analysis_obj)
+
+
+def store_analysis(session: Session, data_obj: Data, cache_key: str, results: dict, content: bytes, suffix: str) -> Analysis:
+    """Persist encoded analysis as static/analyses/<id>.<suffix> and put it into memory cache"""
+    analysis_id = str(uuid4())
+    analysis_obj = Analysis(
+        id=analysis_id,
+        data_id=data_obj.id,
+        cache_key=cache_key,
+        uri=f"static/analyses/{analysis_id}.{suffix}",
+        results=results,
+    )
+    _save_with_file(session, analysis_obj, content)
+    analysis_cache.put(cache_key, (analysis_id, content))
+    return analysis_obj
+
+
+def invalidate_analyses(session: Session, data_id: str) -> list[str]:
+    """
+    Delete cached analyses of dataset and evict them from memory.
+    Returns uris of report files, they should be removed with remove_report_files after commit.
+    """
+    stmt = select(Analysis.cache_key, Analysis.uri).where(Analysis.data_id == data_id)
+    rows = session.execute(stmt).all()
+    session.execute(delete(Analysis).where(Analysis.data_id == data_id))
+    for cache_key, _ in rows:
+        if cache_key:
+            analysis_cache.pop(cache_key)
+    return [uri for _, uri in rows if uri]
+
+
+def find_reusable_prediction(session: Session, cache_key: str) -> Prediction | None:
+    """
+    Prediction with cache_key which doesn't have to be queued again: succeeded one with existing report
+    (looked up in memory first) or unfinished one, whose result will do as well.
+    """
+    cached = prediction_cache.get(cache_key)
+    if cached is not None:
+        prediction_obj = session.get(Prediction, cached[0])
+        if prediction_obj is not None:
+            return prediction_obj
+        prediction_cache.pop(cache_key)
+    
+    stmt = (
+        select(Prediction)
+        .where(Prediction.cache_key == cache_key)
+        .where(Prediction.status != PredictionStatus.FAILED)
+        .order_by(Prediction.created_at.desc())
+        .limit(1)
+    )
+    prediction_obj = session.execute(stmt).scalar_one_or_none()
+    if prediction_obj is None or prediction_obj.status != PredictionStatus.SUCCEEDED:
+        return prediction_obj
+    if get_prediction_content(prediction_obj) is None:
+        # report file is gone, row is stale
+        session.delete(prediction_obj)
+        session.commit()
+        return None
+    return prediction_obj
+
+
+def get_prediction_content(prediction_obj: Prediction) -> bytes | None:
+    if prediction_obj.cache_key:
+        cached = prediction_cache.get(prediction_obj.cache_key)
+        if cached is not None and cached[0] == prediction_obj.id:
+            return cached[1]
+    content = _read_file(prediction_obj)
+    if content is not None and prediction_obj.cache_key:
+        prediction_cache.put(prediction_obj.cache_key, (prediction_obj.id, content))
+    return content
+
+
+def invalidate_predictions(session: Session, data_id: str, error: str) -> list[str]:
+    """
+    Delete finished predictions of dataset and evict them from memory, returns uris of report files to remove after commit.
+    Queued and running jobs are failed with error instead, so they don't save results of stale data, see src.jobs.run_prediction_job.
+    """
+    is_unfinished = Prediction.status.in_(UNFINISHED_PREDICTION_STATUSES)
+    stmt = select(Prediction.cache_key, Prediction.uri).where(Prediction.data_id == data_id).where(~is_unfinished)
+    rows = session.execute(stmt).all()
+    session.execute(delete(Prediction).where(Prediction.data_id == data_id).where(~is_unfinished))
+    session.execute(
+        update(Prediction)
+        .where(Prediction.data_id == data_id)
+        .where(is_unfinished)
+        .values(status=PredictionStatus.FAILED.value, error=error, finished_at=datetime.now())
+    )
+    for cache_key, _ in rows:
+        if cache_key:
+            prediction_cache.pop(cache_key)
+    return [uri for _, uri in rows if uri]
+
+
+def remove_report_files(uris: list[str]) -> None:
+    for uri in uris:
+        (BASE_DIR / uri).unlink(missing_ok=True)
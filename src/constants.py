@@ -1,3 +1,4 @@
+import os
 from enum import Enum
 from pathlib import Path
 
@@ -12,14 +13,118 @@ class FileType(str, Enum):
     CSV = "csv"
     JSON = "json"
     EXCEL = "excel"
+    NDJSON = "ndjson"
+
+
+FILE_SUFFIXES = {
+    FileType.CSV: "csv",
+    FileType.JSON: "json",
+    FileType.EXCEL: "xlsx",
+    FileType.NDJSON: "ndjson",
+}
+
+
+class DataStatus(str, Enum):
+    PENDING = "pending" # uploaded, conversion into columnar format is running in background
+    READY = "ready"
+    FAILED = "failed"
+
+
+class PredictionStatus(str, Enum):
+    QUEUED = "queued" # waiting for free worker of prediction process pool
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+UNFINISHED_PREDICTION_STATUSES = (PredictionStatus.QUEUED.value, PredictionStatus.RUNNING.value)
+
+
+class AnalysisMode(str, Enum):
+    HTML = "html" # plotly report with embedded plotly.js
+    JSON = "json" # arrays as json lists of float32 values
+    BINARY = "binary" # arrays as base64 of little-endian bytes
+
+
+ANALYSIS_SUFFIXES = {
+    AnalysisMode.HTML: "html",
+    AnalysisMode.JSON: "json",
+    AnalysisMode.BINARY: "json",
+}
+
+ANALYSIS_MEDIA_TYPES = {
+    AnalysisMode.HTML: "text/html",
+    AnalysisMode.JSON: "application/json",
+    AnalysisMode.BINARY: "application/json",
+}
+
+
+class AggregateFreq(str, Enum):
+    DAY = "D"
+    WEEK = "W" # weeks start on monday
+    MONTH = "M"
+
+
+class AggregateFunction(str, Enum):
+    MEAN = "mean"
+    SUM = "sum"
+    MIN = "min"
+    MAX = "max"
 
 
 class FileMimeType(str, Enum):
     CSV = "text/csv"
     JSON = "application/json"
+    NDJSON = "application/x-ndjson"
     EXCEL = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SQLITE_URL = f"sqlite:///{BASE_DIR}/database.db"
+
+DATA_DIR = BASE_DIR / "static" / "data"
+ANALYSIS_DIR = BASE_DIR / "static" / "analyses"
+MODEL_DIR = BASE_DIR / "static" / "models"
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024)) # bytes read per iteration while streaming upload to disk
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 256 * 1024 * 1024)) # bytes, larger uploads are aborted with 413
+
+VALIDATION_CHUNK_SIZE = int(os.getenv("VALIDATION_CHUNK_SIZE", 50_000)) # rows validated per iteration
+VALIDATION_MAX_ERRORS = int(os.getenv("VALIDATION_MAX_ERRORS", 20)) # validation stops reading file after this many errors
+
+MIN_PREDICTION_ROWS = 30
+
+DATA_POINT_BATCH_SIZE = int(os.getenv("DATA_POINT_BATCH_SIZE", 10_000)) # rows per executemany batch on insert into data_point
+COLUMNAR_MAX_SEGMENTS = int(os.getenv("COLUMNAR_MAX_SEGMENTS", 16)) # appends written as separate Arrow files before artifact is compacted into one
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", min(4, os.cpu_count() or 1))) # processes converting and validating batch uploads
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", 50))
+
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", 32)) # analyses kept in memory of API process
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", 128 * 1024 * 1024)) # total size of analyses kept in memory
+ANALYSIS_MAX_POINTS = int(os.getenv("ANALYSIS_MAX_POINTS", 5_000)) # default limit of plan/fact points returned by analysis
+ANALYSIS_MIN_POINTS = 6 # smallest limit of plan/fact points, LTTB needs 3 points (first, last and one inner) of each series
+ANALYSIS_STREAMING_MIN_ROWS = int(os.getenv("ANALYSIS_STREAMING_MIN_ROWS", 5_000_000)) # larger selections are analyzed chunk by chunk
+ANALYSIS_CHUNK_SIZE = int(os.getenv("ANALYSIS_CHUNK_SIZE", 500_000)) # rows per chunk of streaming analysis
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", min(4, os.cpu_count() or 1))) # processes computing per object analysis
+
+# predictions computed in background after upload with prewarm=true, comma separated <model>:<horizon> pairs
+PREWARM_PREDICTIONS = [
+    (AvailableModel(model.strip()), int(horizon))
+    for model, horizon in (item.split(":") for item in os.getenv("PREWARM_PREDICTIONS", "XGBOOST:48").split(",") if item.strip())
+]
+
+PREDICTION_WORKERS = int(os.getenv("PREDICTION_WORKERS", min(2, os.cpu_count() or 1))) # processes fitting prediction models
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 32)) # prediction reports kept in memory of API process
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", 128 * 1024 * 1024)) # total size of prediction reports kept in memory
+PREDICTION_MAX_QUEUED = int(os.getenv("PREDICTION_MAX_QUEUED", 100)) # new prediction jobs are rejected with 503 above this many unfinished ones
+XGBOOST_THREADS = int(os.getenv("XGBOOST_THREADS", max(1, (os.cpu_count() or 1) // PREDICTION_WORKERS))) # threads of XGBoost fit and predict in every prediction worker
+
+WORKER_HEARTBEAT_INTERVAL = int(os.getenv("WORKER_HEARTBEAT_INTERVAL", 10)) # seconds between heartbeats of API process
+WORKER_HEARTBEAT_TIMEOUT = int(os.getenv("WORKER_HEARTBEAT_TIMEOUT", 60)) # seconds without heartbeat after which background work of API process is failed
+
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", 8)) # fitted models kept in memory of every prediction worker
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", 256 * 1024 * 1024)) # serialized size of fitted models kept in memory of every prediction worker
+MODEL_STORE_MAX_BYTES = int(os.getenv("MODEL_STORE_MAX_BYTES", 1024 * 1024 * 1024)) # least recently used fitted models are removed from disk above this size
+SARIMA_APPEND_MAX_ROWS = int(os.getenv("SARIMA_APPEND_MAX_ROWS", 0)) # train window grown by at most this many hours only extends previous SARIMA fit without re-estimation, 0 - always re-estimate
@@ -1,12 +1,12 @@
 from uuid import uuid4, UUID
 from datetime import datetime
 
-from sqlalchemy import create_engine, ForeignKey, String, JSON, DateTime, Integer
+from sqlalchemy import create_engine, ForeignKey, String, JSON, DateTime, Integer, Float, Index
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, DeclarativeBase, Mapped, mapped_column, relationship
 from fastapi import HTTPException, status
 
-from src.constants import SQLITE_URL
+from src.constants import SQLITE_URL, DataStatus, PredictionStatus
 
 engine = create_engine(url=SQLITE_URL)
 
@@ -44,9 +44,36 @@ class Data(TimeBasedMixin, Base):
     extension: Mapped[str] = mapped_column(String)
     original_name: Mapped[str] = mapped_column(String)
     size: Mapped[int] = mapped_column(Integer)
-
+    content_hash: Mapped[str | None] = mapped_column(String, nullable=True) # sha256 hex digest of uploaded bytes
+    columnar_uri: Mapped[str | None] = mapped_column(String, nullable=True) # parsed copy of uri in Arrow IPC format
+    columnar_segments: Mapped[list | None] = mapped_column(JSON, nullable=True) # Arrow files of rows appended after columnar_uri was written
+    row_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    min_date: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    max_date: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    status: Mapped[str] = mapped_column(String, default=DataStatus.READY.value, server_default=DataStatus.READY.value)
+    status_detail: Mapped[JSON | None] = mapped_column(JSON, nullable=True) # reason of failed background conversion
+    # dataset which data_point and rollup rows are used by this one (upload of already ingested content), NULL - own rows
+    rows_owner_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    worker_id: Mapped[str | None] = mapped_column(String, nullable=True) # API process running background conversion, see src.workers
+    
+    blob_id: Mapped[str | None] = mapped_column(String, ForeignKey("blob.id"), nullable=True)
+    blob: Mapped["Blob"] = relationship(back_populates="data")
     analyses: Mapped["Analysis"] = relationship(back_populates="data")
-    predictions: Mapped["Prediction"] = relationship(back_populates="data")
+    # jobs failed by deletion of dataset are kept, so GET /predictions/{id} reports why, see src.cache.invalidate_predictions
+    predictions: Mapped["Prediction"] = relationship(back_populates="data", passive_deletes="all")
+
+
+class Blob(TimeBasedMixin, Base):
+    """Uploaded file stored once per content, id is sha256 of its bytes"""
+    __tablename__ = "blob"
+    
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    uri: Mapped[str] = mapped_column(String)
+    extension: Mapped[str] = mapped_column(String)
+    size: Mapped[int] = mapped_column(Integer)
+    ref_count: Mapped[int] = mapped_column(Integer, default=1) # number of Data rows referring to blob
+    
+    data: Mapped[list["Data"]] = relationship(back_populates="blob")
 
 
 class Analysis(TimeBasedMixin, Base):
@@ -54,6 +81,8 @@ class Analysis(TimeBasedMixin, Base):
     
     id: Mapped[UUID] = mapped_column(String, primary_key=True, default=uuid4)
     results: Mapped[JSON] = mapped_column(JSON)
+    cache_key: Mapped[str | None] = mapped_column(String, nullable=True, index=True) # sha256 of data content hash, params and analysis version
+    uri: Mapped[str | None] = mapped_column(String, nullable=True) # rendered html report
     
     data_id: Mapped[UUID] = mapped_column(String, ForeignKey("data.id"))
     data: Mapped["Data"] = relationship(back_populates="analyses")
@@ -64,6 +93,113 @@ class Prediction(TimeBasedMixin, Base):
     
     id: Mapped[UUID] = mapped_column(String, primary_key=True, default=uuid4)
     results: Mapped[JSON] = mapped_column(JSON)
+    cache_key: Mapped[str | None] = mapped_column(String, nullable=True, index=True) # sha256 of data content hash, params and prediction version
+    uri: Mapped[str | None] = mapped_column(String, nullable=True) # rendered html report
+    # predictions saved before job queue was introduced were computed synchronously
+    status: Mapped[str] = mapped_column(String, default=PredictionStatus.QUEUED.value, server_default=PredictionStatus.SUCCEEDED.value)
+    error: Mapped[str | None] = mapped_column(String, nullable=True) # exception of failed job
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    worker_id: Mapped[str | None] = mapped_column(String, nullable=True) # API process which submitted the job, see src.workers
     
     data_id: Mapped[UUID] = mapped_column(String, ForeignKey("data.id"))
     data: Mapped["Data"] = relationship(back_populates="predictions")
+
+
+class DataPoint(Base):
+    __tablename__ = "data_point"
+    __table_args__ = (
+        Index("ix_data_point_data_id_object_name_ts", "data_id", "object_name", "ts"),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    data_id: Mapped[UUID] = mapped_column(String, ForeignKey("data.id"))
+    object_name: Mapped[str] = mapped_column(String)
+    unit: Mapped[str] = mapped_column(String)
+    ts: Mapped[datetime] = mapped_column(DateTime)
+    plan: Mapped[float | None] = mapped_column(Float, nullable=True)
+    fact: Mapped[float | None] = mapped_column(Float, nullable=True)
+    cloudiness: Mapped[float | None] = mapped_column(Float, nullable=True)
+    temperature: Mapped[float | None] = mapped_column(Float, nullable=True)
+    wind_speed: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+
+class DataRollup(Base):
+    """Count, sum, min and max of every measure per object and period, precomputed from data_point rows"""
+    __tablename__ = "data_rollup"
+    __table_args__ = (
+        Index("ix_data_rollup_data_id_freq_object_name_period", "data_id", "freq", "object_name", "period"),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    data_id: Mapped[UUID] = mapped_column(String, ForeignKey("data.id"))
+    freq: Mapped[str] = mapped_column(String) # D - day, M - month
+    object_name: Mapped[str] = mapped_column(String)
+    period: Mapped[datetime] = mapped_column(DateTime) # start of period
+    plan_count: Mapped[int] = mapped_column(Integer, default=0)
+    plan_sum: Mapped[float | None] = mapped_column(Float, nullable=True)
+    plan_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    plan_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+    fact_count: Mapped[int] = mapped_column(Integer, default=0)
+    fact_sum: Mapped[float | None] = mapped_column(Float, nullable=True)
+    fact_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    fact_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+    cloudiness_count: Mapped[int] = mapped_column(Integer, default=0)
+    cloudiness_sum: Mapped[float | None] = mapped_column(Float, nullable=True)
+    cloudiness_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    cloudiness_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+    temperature_count: Mapped[int] = mapped_column(Integer, default=0)
+    temperature_sum: Mapped[float | None] = mapped_column(Float, nullable=True)
+    temperature_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    temperature_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+    wind_speed_count: Mapped[int] = mapped_column(Integer, default=0)
+    wind_speed_sum: Mapped[float | None] = mapped_column(Float, nullable=True)
+    wind_speed_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    wind_speed_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+
+class KpiRollup(Base):
+    """Daily plan/fact deviation sums per object, metrics of any period and set of datasets are derived from them"""
+    __tablename__ = "kpi_rollup"
+    __table_args__ = (
+        Index("ix_kpi_rollup_data_id_object_name_period", "data_id", "object_name", "period"),
+        Index("ix_kpi_rollup_period", "period"),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    data_id: Mapped[UUID] = mapped_column(String, ForeignKey("data.id"))
+    object_name: Mapped[str] = mapped_column(String)
+    period: Mapped[datetime] = mapped_column(DateTime) # day
+    rows: Mapped[int] = mapped_column(Integer) # rows having both plan and fact
+    plan_sum: Mapped[float] = mapped_column(Float)
+    fact_sum: Mapped[float] = mapped_column(Float)
+    fact_abs_sum: Mapped[float] = mapped_column(Float)
+    abs_deviation_sum: Mapped[float] = mapped_column(Float) # sum of |fact - plan|
+    deviation_sum: Mapped[float] = mapped_column(Float) # sum of fact - plan
+    ape_sum: Mapped[float] = mapped_column(Float) # sum of |fact - plan| / |fact| over rows with non zero fact
+    ape_count: Mapped[int] = mapped_column(Integer)
+
+
+class FittedModel(TimeBasedMixin, Base):
+    """Serialized fitted prediction model, reused by forecasts of any horizon on the same train window"""
+    __tablename__ = "fitted_model"
+    
+    id: Mapped[str] = mapped_column(String, primary_key=True) # sha256 of training key, see src.model.training_key
+    model_type: Mapped[str] = mapped_column(String)
+    data_hash: Mapped[str] = mapped_column(String) # sha256 of train rows
+    train_start: Mapped[datetime] = mapped_column(DateTime)
+    train_end: Mapped[datetime] = mapped_column(DateTime)
+    train_rows: Mapped[int] = mapped_column(Integer)
+    params: Mapped[JSON] = mapped_column(JSON) # hyperparameters
+    uri: Mapped[str] = mapped_column(String) # static/models/<id>.model
+    size: Mapped[int] = mapped_column(Integer)
+    used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.now, index=True)
+
+
+class Worker(Base):
+    """Running API process, background work it started is failed only after it stops sending heartbeats"""
+    __tablename__ = "worker"
+    
+    id: Mapped[str] = mapped_column(String, primary_key=True) # <hostname>:<pid>:<random suffix>
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
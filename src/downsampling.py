@@ -0,0 +1,62 @@
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling, returns sorted indices of at most n_out points of (x, y) to keep.
+    First and last points are always kept, from every bucket in between the point forming the largest triangle
+    with the point kept from previous bucket and mean of next bucket is chosen.
+    Areas inside a bucket are computed vectorized, python loop runs once per bucket.
+    x must be sorted, points with NaN y are never chosen.
+    """
+    n = len(x)
+    finite = np.flatnonzero(np.isfinite(y))
+    if len(finite) < n:
+        return finite[lttb_indices(x[finite], y[finite], n_out)]
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:max(n_out, 0)], dtype=np.intp)
+
+    x = x.astype(np.float64, copy=False)
+    y = y.astype(np.float64, copy=False)
+    # inner points 1..n-2 are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    # means of every bucket, used as third vertex of triangle for previous bucket
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes
+    mean_x = np.append(mean_x, x[-1])
+    mean_y = np.append(mean_y, y[-1])
+
+    indices = np.empty(n_out, dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        bx = x[start:stop]
+        by = y[start:stop]
+        # doubled triangle area, constant factor doesn't change argmax
+        area = np.abs(
+            (x[a] - mean_x[bucket + 1]) * (by - y[a])
+            - (x[a] - bx) * (mean_y[bucket + 1] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[bucket + 1] = a
+    return indices
+
+
+def downsample_series(x: np.ndarray, columns: dict[str, np.ndarray], max_points: int) -> np.ndarray:
+    """
+    Indices of rows to keep for several series sharing x, so they can still be sent with one x array.
+    Every series is reduced with LTTB to an equal share of max_points and chosen rows are merged,
+    so at most max_points rows are returned. Shares below 3 points keep only first and last rows.
+    """
+    if max_points <= 0 or len(x) <= max_points:
+        return np.arange(len(x))
+    per_series = max_points // len(columns)
+    if per_series < 3:
+        return np.array([0, len(x) - 1][:max_points], dtype=np.intp)
+    chosen = [lttb_indices(x, y, per_series) for y in columns.values()]
+    return np.unique(np.concatenate(chosen))
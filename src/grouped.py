@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from src.analysis import compute_analysis
+from src.constants import BASE_DIR, ANALYSIS_WORKERS
+from src.database import Data
+from src.loader import get_segment_locations, list_columnar_objects, load_frame
+from src.streaming import analyze_columnar
+from src.workers import get_process_pool
+
+
+def analyze_object(
+    columnar_uri: str,
+    segment_uris: list[str],
+    object_name: str,
+    max_points: int,
+    start_date: datetime | None,
+    end_date: datetime | None,
+) -> dict | None:
+    """
+    Runs in analysis process pool. Worker memory maps artifact itself and reads only row range of its object,
+    so just file path and filters are sent to it and only computed arrays are sent back.
+    """
+    segment_locations = [BASE_DIR / uri for uri in segment_uris]
+    return analyze_columnar(BASE_DIR / columnar_uri, max_points, start_date, end_date, object_name, segment_locations)
+
+
+def compute_grouped_analysis(
+    session: Session,
+    data_obj: Data,
+    max_points: int,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    object_name: str | None = None,
+) -> dict[str, dict]:
+    """Analysis of every object of dataset computed in parallel, objects without selected rows are omitted"""
+    if data_obj.columnar_uri and (BASE_DIR / data_obj.columnar_uri).exists():
+        if object_name is not None:
+            object_names = [object_name]
+        else:
+            object_names = list_columnar_objects(BASE_DIR / data_obj.columnar_uri, get_segment_locations(data_obj))
+        segment_uris = data_obj.columnar_segments or []
+        arguments = [(data_obj.columnar_uri, segment_uris, name, max_points, start_date, end_date) for name in object_names]
+        if len(arguments) == 1:
+            # not worth a round trip to worker process
+            results = {object_names[0]: analyze_object(*arguments[0])}
+        else:
+            pool = get_process_pool("analysis", ANALYSIS_WORKERS)
+            futures = {name: pool.submit(analyze_object, *args) for name, args in zip(object_names, arguments)}
+            results = {name: future.result() for name, future in futures.items()}
+        return {name: result for name, result in results.items() if result is not None}
+    
+    # datasets without artifact are small enough to be analyzed in API process
+    df = load_frame(session, data_obj, start_date, end_date, object_name)
+    return {
+        str(name): compute_analysis(group, max_points)
+        for name, group in df.groupby("object_name", observed=True)
+    }
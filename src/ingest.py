@@ -0,0 +1,331 @@
+import hashlib
+import logging
+from typing import AsyncIterator
+
+import pandas as pd
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import String, insert, delete, select, update, exists, or_, cast
+from sqlalchemy.orm import Session
+
+from src.blobs import detach_data_rows
+from src.constants import BASE_DIR, VALIDATION_MAX_ERRORS, DATA_POINT_BATCH_SIZE, INGEST_WORKERS, COLUMNAR_MAX_SEGMENTS, DataStatus
+from src.database import Session as DBSession, Data, DataPoint
+from src.loader import get_columnar_uri, write_columnar, read_columnar, load_data_points, load_frame
+from src.normalization import MEASURE_COLUMNS, CATEGORY_COLUMNS, concat_frames, drop_duplicate_keys
+from src.records import RecordStreamParser
+from src.rollups import has_rollups, insert_rollups, rebuild_rollups, update_rollups
+from src.schemas import DataFormat, ValidationErrorItem, ValidationReport
+from src.storage import StoredFile, UploadWriter
+from src.validation import validate_file, validate_records
+from src.workers import get_process_pool, is_worker_gone
+
+logger = logging.getLogger(__name__)
+
+
+def insert_data_points(session: Session, data_id: str, df: pd.DataFrame) -> None:
+    """Bulk insert normalized frame into data_point by executemany batches, runs inside caller transaction"""
+    stmt = insert(DataPoint.__table__)
+    for start in range(0, len(df), DATA_POINT_BATCH_SIZE):
+        batch = df.iloc[start:start + DATA_POINT_BATCH_SIZE]
+        columns = [batch.index.to_pydatetime()]
+        columns += [batch[col].astype(str).to_numpy() for col in CATEGORY_COLUMNS]
+        # NaN is stored as NULL
+        columns += [batch[col].astype(object).where(batch[col].notna(), None).to_numpy() for col in MEASURE_COLUMNS]
+        keys = ["ts", *CATEGORY_COLUMNS, *MEASURE_COLUMNS]
+        records = [{"data_id": data_id, **dict(zip(keys, values))} for values in zip(*columns)]
+        session.execute(stmt, records)
+
+
+def delete_data_points(session: Session, data_id: str, df: pd.DataFrame, batch_size: int = 500) -> None:
+    """Delete data_point rows with the same (object_name, ts) keys as rows of normalized frame"""
+    for object_name, dates in df.index.groupby(df["object_name"].to_numpy()).items():
+        timestamps = dates.to_pydatetime().tolist()
+        for start in range(0, len(timestamps), batch_size):
+            session.execute(
+                delete(DataPoint)
+                .where(DataPoint.data_id == data_id)
+                .where(DataPoint.object_name == object_name)
+                .where(DataPoint.ts.in_(timestamps[start:start + batch_size]))
+            )
+
+
+def insert_records(session: Session, data_id: str, records: list[DataFormat]) -> None:
+    session.execute(
+        insert(DataPoint.__table__),
+        [
+            {"data_id": data_id, "ts": record.date, **record.model_dump(exclude={"date"})}
+            for record in records
+        ],
+    )
+
+
+def ingest_data(session: Session, data_obj: Data, max_errors: int = VALIDATION_MAX_ERRORS) -> ValidationReport:
+    """
+    Validate stored upload of data_obj and build derived artifacts from it:
+    columnar copy of normalized frame, data_point rows and min/max date, row count stats on data_obj.
+    Nothing is written if file is invalid, caller is responsible for commit.
+    """
+    report, df = validate_file(BASE_DIR / data_obj.uri, data_obj.extension, max_errors=max_errors)
+    if not report.valid:
+        return report
+    
+    columnar_uri = get_columnar_uri(data_obj.content_hash)
+    write_columnar(df, BASE_DIR / columnar_uri)
+    set_ingest_stats(data_obj, columnar_uri, report)
+    insert_data_points(session, data_obj.id, df)
+    insert_rollups(session, data_obj.id, df)
+    return report
+
+
+def build_columnar(file_uri: str, extension: str, content_hash: str, max_errors: int = VALIDATION_MAX_ERRORS) -> ValidationReport:
+    """
+    CPU bound part of ingest_data: validate file and write columnar artifact.
+    Has no database access, so it can be run in worker process, see ingest_prepared_data.
+    """
+    report, df = validate_file(BASE_DIR / file_uri, extension, max_errors=max_errors)
+    if report.valid:
+        write_columnar(df, BASE_DIR / get_columnar_uri(content_hash))
+    return report
+
+
+def ingest_prepared_data(session: Session, data_obj: Data, report: ValidationReport) -> None:
+    """Finish ingest of data_obj which columnar artifact was built by build_columnar"""
+    columnar_uri = get_columnar_uri(data_obj.content_hash)
+    set_ingest_stats(data_obj, columnar_uri, report)
+    df = read_columnar(BASE_DIR / columnar_uri)
+    insert_data_points(session, data_obj.id, df)
+    insert_rollups(session, data_obj.id, df)
+
+
+def convert_pending_data(data_id: str, max_errors: int = VALIDATION_MAX_ERRORS) -> None:
+    """
+    Background ingest of dataset in PENDING status (used for slow to parse excel files).
+    Conversion runs in ingest process pool, result or failure reason is saved in status of dataset.
+    """
+    with DBSession() as session:
+        data_obj = session.get(Data, data_id)
+        if data_obj is None or data_obj.status != DataStatus.PENDING:
+            return
+        pool = get_process_pool("ingest", INGEST_WORKERS)
+        try:
+            report = pool.submit(build_columnar, data_obj.uri, data_obj.extension, data_obj.content_hash, max_errors).result()
+            if report.valid:
+                ingest_prepared_data(session, data_obj, report)
+                data_obj.status = DataStatus.READY
+            else:
+                data_obj.status = DataStatus.FAILED
+                data_obj.status_detail = report.model_dump(mode="json")
+            session.commit()
+        except Exception as e:
+            # dataset must not stay PENDING, otherwise it's rejected with 409 forever
+            session.rollback()
+            data_obj.status = DataStatus.FAILED
+            data_obj.status_detail = f"Не удалось прочитать содержимое файла: {e}"
+            session.commit()
+
+
+def fail_interrupted_ingest() -> None:
+    """
+    Conversions of API process which stopped or crashed will never finish, datasets are marked failed
+    on startup and by heartbeats of running processes. Conversions of live processes are left to them.
+    """
+    with DBSession() as session:
+        stmt = (
+            update(Data)
+            .where(Data.status == DataStatus.PENDING.value)
+            .where(is_worker_gone(Data.worker_id))
+            .values(status=DataStatus.FAILED.value, status_detail="Обработка файла прервана остановкой сервера, загрузите файл повторно")
+        )
+        session.execute(stmt)
+        session.commit()
+
+
+def backfill_rollups() -> None:
+    """
+    Build rollups of ready datasets ingested before rollups existed, runs once in background on startup.
+    Datasets which can't be read (e.g. their file is gone) are logged and skipped, fleet queries don't include them.
+    """
+    with DBSession() as session:
+        # datasets sharing rows of another one get rollups with it
+        stmt = select(Data.id).where(Data.status == DataStatus.READY.value).where(Data.rows_owner_id.is_(None))
+        data_ids = session.execute(stmt).scalars().all()
+        for data_id in data_ids:
+            if has_rollups(session, data_id):
+                continue
+            try:
+                rebuild_rollups(session, data_id, load_frame(session, session.get(Data, data_id)))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.warning("Rollup backfill of data %s skipped: %s: %s", data_id, type(e).__name__, e)
+
+
+def set_ingest_stats(data_obj: Data, columnar_uri: str, report: ValidationReport) -> None:
+    data_obj.columnar_uri = columnar_uri
+    data_obj.row_count = report.row_count
+    data_obj.min_date = report.min_date
+    data_obj.max_date = report.max_date
+
+
+async def ingest_record_stream(
+    session: Session,
+    data_obj: Data,
+    stream: AsyncIterator[bytes],
+    writer: UploadWriter,
+    is_array: bool,
+    max_errors: int = VALIDATION_MAX_ERRORS,
+) -> ValidationReport:
+    """
+    Parse DataFormat records from request body stream (NDJSON or JSON array) as they arrive,
+    raw body is copied to writer, records are validated and inserted into data_point by batches.
+    Stops at first max_errors errors, caller is responsible for commit or rollback.
+    """
+    parser = RecordStreamParser(is_array=is_array)
+    pending: list[dict] = []
+    errors: list[ValidationErrorItem] = []
+    row_count = 0
+    
+    def flush(records: list[dict]) -> None:
+        nonlocal row_count
+        models, batch_errors = validate_records(records, offset=row_count)
+        row_count += len(records)
+        errors.extend(batch_errors)
+        if not errors:
+            insert_records(session, data_obj.id, models)
+    
+    async for chunk in stream:
+        await run_in_threadpool(writer.write, chunk)
+        pending.extend(parser.feed(chunk))
+        while len(pending) >= DATA_POINT_BATCH_SIZE:
+            await run_in_threadpool(flush, pending[:DATA_POINT_BATCH_SIZE])
+            pending = pending[DATA_POINT_BATCH_SIZE:]
+            if len(errors) >= max_errors:
+                return ValidationReport(valid=False, row_count=row_count, errors=errors[:max_errors], truncated=True)
+    pending.extend(parser.close())
+    if pending:
+        await run_in_threadpool(flush, pending)
+    
+    if not errors and row_count == 0:
+        errors.append(ValidationErrorItem(row=0, column="date", message="Запрос не содержит записей"))
+    if errors:
+        return ValidationReport(
+            valid=False,
+            row_count=row_count,
+            errors=errors[:max_errors],
+            truncated=len(errors) > max_errors,
+        )
+    return ValidationReport(valid=True, row_count=row_count)
+
+
+def finalize_record_ingest(session: Session, data_obj: Data) -> None:
+    """Build columnar artifact and stats for dataset which rows were inserted directly into data_point"""
+    df = load_data_points(session, data_obj.id)
+    columnar_uri = get_columnar_uri(data_obj.content_hash)
+    write_columnar(df, BASE_DIR / columnar_uri)
+    data_obj.columnar_uri = columnar_uri
+    data_obj.row_count = len(df)
+    data_obj.min_date = df.index[0]
+    data_obj.max_date = df.index[-1]
+    insert_rollups(session, data_obj.id, df)
+
+
+def append_rows(
+    session: Session,
+    data_obj: Data,
+    stored_file: StoredFile,
+    extension: str,
+    max_errors: int = VALIDATION_MAX_ERRORS,
+) -> ValidationReport:
+    """
+    Add rows of stored_file to existing dataset, rows with already existing (object_name, date) replace old ones.
+    Only the new rows are parsed and only stored rows of months they fall into are read back:
+    data_point, rollups and stats are updated by the appended rows, rows with new keys are written as extra
+    columnar segment (see get_segment_locations). Whole artifact is rewritten into one file only when appended rows
+    replace existing ones or COLUMNAR_MAX_SEGMENTS is reached, so hourly appends don't cost O(history) I/O.
+    Caller is responsible for commit.
+    Raises 409 HTTPException if dataset was changed by another append since it was read.
+    """
+    report, new_df = validate_file(stored_file.path, extension, max_errors=max_errors)
+    if not report.valid:
+        return report
+    new_df = drop_duplicate_keys(new_df)
+    # rows shared with uploads of the same content must stay as they are for them
+    detach_data_rows(session, data_obj)
+    
+    # datasets uploaded before data_point or rollups existed are rebuilt from all rows once
+    has_data_points = data_obj.row_count is not None
+    incremental = has_data_points and has_rollups(session, data_obj.id)
+    if incremental:
+        # rollups of these months are recomputed, replaced rows can only be among them
+        window_start = new_df.index[0].to_period("M").start_time
+        window_end = (new_df.index[-1].to_period("M") + 1).start_time - pd.Timedelta(microseconds=1)
+        previous = load_frame(session, data_obj, window_start.to_pydatetime(), window_end.to_pydatetime())
+    else:
+        previous = load_frame(session, data_obj)
+    df = drop_duplicate_keys(concat_frames([previous, new_df]))
+    added_rows = len(df) - len(previous)
+    
+    # content hash of appended dataset is derived from previous one, so it is unique for every data revision
+    previous_hash = data_obj.content_hash
+    content_hash = hashlib.sha256(f"{previous_hash}:{stored_file.sha256}".encode()).hexdigest()
+    # compare-and-swap on content hash: concurrent append built its frame from the same revision and committed first,
+    # saving this frame would drop its rows from columnar artifact
+    stmt = (
+        update(Data)
+        .where(Data.id == data_obj.id)
+        .where(Data.content_hash.is_not_distinct_from(previous_hash))
+        .values(content_hash=content_hash)
+    )
+    if session.execute(stmt).rowcount == 0:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Данные были изменены другим запросом, повторите добавление записей"
+        )
+    
+    columnar_uri = get_columnar_uri(content_hash)
+    segments = list(data_obj.columnar_segments or [])
+    has_artifact = data_obj.columnar_uri is not None and (BASE_DIR / data_obj.columnar_uri).exists()
+    if incremental and has_artifact and added_rows == len(new_df) and len(segments) < COLUMNAR_MAX_SEGMENTS:
+        # keys of segments must not overlap, so only appends without replaced rows become segment
+        write_columnar(new_df, BASE_DIR / columnar_uri)
+        segments.append(columnar_uri)
+    else:
+        full_df = df if not incremental else drop_duplicate_keys(concat_frames([load_frame(session, data_obj), new_df]))
+        write_columnar(full_df, BASE_DIR / columnar_uri)
+        data_obj.columnar_uri = columnar_uri
+        segments = []
+    try:
+        data_obj.columnar_segments = segments or None
+        data_obj.row_count = data_obj.row_count + added_rows if incremental else len(df)
+        data_obj.min_date = min(data_obj.min_date, new_df.index[0]) if data_obj.min_date else new_df.index[0]
+        data_obj.max_date = max(data_obj.max_date, new_df.index[-1]) if data_obj.max_date else new_df.index[-1]
+        
+        data_point_rows = new_df if has_data_points else df
+        delete_data_points(session, data_obj.id, data_point_rows)
+        insert_data_points(session, data_obj.id, data_point_rows)
+        update_rollups(session, data_obj.id, df, new_df)
+    except BaseException:
+        # file of this revision is referenced by nobody until commit
+        (BASE_DIR / columnar_uri).unlink(missing_ok=True)
+        raise
+    return ValidationReport(
+        valid=True,
+        row_count=len(new_df),
+        min_date=new_df.index[0],
+        max_date=new_df.index[-1],
+    )
+
+
+def get_columnar_files(data_obj: Data) -> list[str]:
+    """Uris of columnar artifact of dataset and its segments"""
+    return [uri for uri in [data_obj.columnar_uri, *(data_obj.columnar_segments or [])] if uri]
+
+
+def remove_unused_columnar(session: Session, uris: list[str]) -> None:
+    """Remove columnar artifact and segment files no dataset refers to anymore"""
+    for uri in uris:
+        # segments are stored as JSON list of uris
+        referenced = or_(Data.columnar_uri == uri, cast(Data.columnar_segments, String).contains(f'"{uri}"'))
+        if not session.execute(select(exists().where(referenced))).scalar():
+            (BASE_DIR / uri).unlink(missing_ok=True)
@@ -0,0 +1,132 @@
+from concurrent.futures import Future
+from datetime import datetime
+from functools import partial
+from uuid import uuid4
+
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+
+from src.constants import BASE_DIR, PREDICTION_WORKERS, UNFINISHED_PREDICTION_STATUSES, AvailableModel, PredictionStatus
+from src.database import Session as DBSession, Data, Prediction
+from src.loader import load_frame
+from src.model import create_prediction
+from src.registry import get_fitted_model
+from src.workers import WORKER_ID, get_process_pool, is_worker_gone
+
+
+def count_unfinished_jobs(session: Session) -> int:
+    stmt = select(func.count()).select_from(Prediction).where(Prediction.status.in_(UNFINISHED_PREDICTION_STATUSES))
+    return session.execute(stmt).scalar_one()
+
+
+def enqueue_prediction(session: Session, data_obj: Data, cache_key: str, results: dict) -> Prediction:
+    """
+    Save prediction in QUEUED status and submit it to prediction process pool.
+    results must contain params of the job: model_type, forecast_horizon and filters of AnalysisFilterParams.
+    """
+    prediction_id = str(uuid4())
+    prediction_obj = Prediction(
+        id=prediction_id,
+        data_id=data_obj.id,
+        cache_key=cache_key,
+        results=results,
+        status=PredictionStatus.QUEUED,
+        worker_id=WORKER_ID,
+    )
+    session.add(prediction_obj)
+    session.commit()
+    future = get_process_pool("prediction", PREDICTION_WORKERS).submit(run_prediction_job, prediction_id)
+    future.add_done_callback(lambda future: _check_job_future(future, prediction_id))
+    return prediction_obj
+
+
+def _check_job_future(future: Future, prediction_id: str) -> None:
+    """Job errors are saved by the job itself, here only crashed or cancelled workers are reported"""
+    if future.cancelled():
+        error = "Прогнозирование отменено остановкой сервера"
+    elif future.exception() is not None:
+        error = f"{type(future.exception()).__name__}: {future.exception()}"
+    else:
+        return
+    with DBSession() as session:
+        _fail_unfinished(session, error, Prediction.id == prediction_id)
+
+
+def _fail_unfinished(session: Session, error: str, *where) -> None:
+    stmt = (
+        update(Prediction)
+        .where(Prediction.status.in_(UNFINISHED_PREDICTION_STATUSES), *where)
+        .values(status=PredictionStatus.FAILED.value, error=error, finished_at=datetime.now())
+    )
+    session.execute(stmt)
+    session.commit()
+
+
+def fail_interrupted_jobs() -> None:
+    """
+    Jobs of API process which stopped or crashed will never finish, they are marked failed
+    on startup and by heartbeats of running processes. Jobs of live processes are left to them.
+    """
+    with DBSession() as session:
+        _fail_unfinished(session, "Прогнозирование прервано остановкой сервера", is_worker_gone(Prediction.worker_id))
+
+
+def run_prediction_job(prediction_id: str) -> None:
+    """
+    Fit model of queued prediction, runs in prediction process pool.
+    Report is saved as static/predictions/<id>.html, status, timing and exception are saved in prediction row.
+    """
+    with DBSession() as session:
+        # status is changed only by conditional updates: job may be failed meanwhile by src.cache.invalidate_predictions
+        stmt = (
+            update(Prediction)
+            .where(Prediction.id == prediction_id)
+            .where(Prediction.status == PredictionStatus.QUEUED.value)
+            .values(status=PredictionStatus.RUNNING.value, started_at=datetime.now())
+        )
+        is_started = session.execute(stmt).rowcount > 0
+        session.commit()
+        if not is_started:
+            return
+        prediction_obj = session.get(Prediction, prediction_id)
+
+        params = prediction_obj.results["params"]
+        uri = f"static/predictions/{prediction_id}.html"
+        file_location = BASE_DIR / uri
+        try:
+            df = load_frame(
+                session,
+                prediction_obj.data,
+                start_date=datetime.fromisoformat(params["start_date"]) if params["start_date"] else None,
+                end_date=datetime.fromisoformat(params["end_date"]) if params["end_date"] else None,
+                object_name=params["object_name"],
+            )
+            html_content = create_prediction(
+                df=df,
+                model_type=AvailableModel(params["model_type"]),
+                forecast_horizon=params["forecast_horizon"],
+                get_fitted_model=partial(get_fitted_model, session),
+            )
+            tmp_location = file_location.with_name(f"{file_location.name}.tmp")
+            tmp_location.write_text(html_content)
+            tmp_location.replace(file_location)
+        except Exception as e:
+            session.rollback()
+            result = {"status": PredictionStatus.FAILED.value, "error": f"{type(e).__name__}: {e}"}
+        else:
+            result = {"status": PredictionStatus.SUCCEEDED.value, "uri": uri}
+        stmt = (
+            update(Prediction)
+            .where(Prediction.id == prediction_id)
+            .where(Prediction.status == PredictionStatus.RUNNING.value)
+            .values(**result, finished_at=datetime.now())
+        )
+        try:
+            is_saved = session.execute(stmt).rowcount > 0
+            session.commit()
+        except BaseException:
+            file_location.unlink(missing_ok=True)
+            raise
+        if not is_saved:
+            # report of data which was changed or deleted while job was running
+            file_location.unlink(missing_ok=True)
@@ -0,0 +1,135 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, func
+from sqlalchemy.orm import Session
+
+from src.constants import AggregateFreq, DataStatus
+from src.database import Data, KpiRollup
+
+KPI_COLUMNS = [
+    "rows",
+    "plan_sum",
+    "fact_sum",
+    "fact_abs_sum",
+    "abs_deviation_sum",
+    "deviation_sum",
+    "ape_sum",
+    "ape_count",
+]
+
+
+def compute_daily_kpi(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Plan/fact deviation sums of normalized frame per (object_name, day).
+    Only rows having both plan and fact are counted, percentage error is summed over rows with non zero fact.
+    """
+    plan = df["plan"].to_numpy(dtype=np.float64)
+    fact = df["fact"].to_numpy(dtype=np.float64)
+    both = ~np.isnan(plan) & ~np.isnan(fact)
+    deviation = np.where(both, fact - plan, 0.0)
+    abs_deviation = np.abs(deviation)
+    nonzero = both & (fact != 0)
+    fact_abs = np.where(both, np.abs(fact), 0.0)
+    parts = pd.DataFrame(
+        {
+            "rows": both.astype(np.int64),
+            "plan_sum": np.where(both, plan, 0.0),
+            "fact_sum": np.where(both, fact, 0.0),
+            "fact_abs_sum": fact_abs,
+            "abs_deviation_sum": abs_deviation,
+            "deviation_sum": deviation,
+            "ape_sum": np.divide(abs_deviation, fact_abs, out=np.zeros_like(abs_deviation), where=nonzero),
+            "ape_count": nonzero.astype(np.int64),
+        },
+        index=df.index,
+    )
+    keys = [df["object_name"].astype(str).rename("object_name"), df.index.floor("D").rename("period")]
+    daily = parts.groupby(keys, sort=False).sum()
+    return daily[daily["rows"] > 0].reset_index()
+
+
+def insert_kpi(session: Session, data_id: str, df: pd.DataFrame) -> None:
+    records = compute_daily_kpi(df).to_dict("records")
+    if records:
+        session.execute(insert(KpiRollup.__table__), [{"data_id": data_id, **record} for record in records])
+
+
+def kpi_metrics(sums: pd.DataFrame) -> pd.DataFrame:
+    """KPI of periods from summed deviation parts, undefined metrics (no rows, zero fact) are NaN"""
+    rows = sums["rows"].where(sums["rows"] > 0)
+    result = pd.DataFrame({
+        "rows": sums["rows"],
+        "plan_total": sums["plan_sum"],
+        "fact_total": sums["fact_sum"],
+        "deviation": sums["deviation_sum"], # net imbalance, fact - plan
+        "abs_deviation": sums["abs_deviation_sum"],
+        "pct_deviation": sums["abs_deviation_sum"] / sums["fact_abs_sum"].where(sums["fact_abs_sum"] > 0) * 100,
+        "bias": sums["deviation_sum"] / rows,
+        "mape": sums["ape_sum"] / sums["ape_count"].where(sums["ape_count"] > 0) * 100,
+    })
+    return result
+
+
+def _period_start(freq: AggregateFreq):
+    """SQL expression of first day of period containing KpiRollup.period, as YYYY-MM-DD text"""
+    if freq == AggregateFreq.WEEK:
+        # monday on or before the day
+        return func.date(KpiRollup.period, "-6 days", "weekday 1")
+    if freq == AggregateFreq.MONTH:
+        return func.strftime("%Y-%m-01", KpiRollup.period)
+    return func.date(KpiRollup.period)
+
+
+def load_kpi(
+    session: Session,
+    freq: AggregateFreq,
+    by_object: bool = True,
+    data_id: str | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    object_name: str | None = None,
+) -> pd.DataFrame:
+    """
+    Plan/fact KPI per period (and object when by_object) summed inside database from daily KPI rollups.
+    Without data_id all ready datasets are included, datasets with equal content are counted once.
+    Periods are included whole when they overlap [start_date, end_date].
+    Returns columns [object_name,] period and metrics of kpi_metrics.
+    """
+    period = _period_start(freq).label("period")
+    keys = [KpiRollup.object_name, period] if by_object else [period]
+    stmt = (
+        select(*keys, *(func.sum(getattr(KpiRollup, col)).label(col) for col in KPI_COLUMNS))
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+    if data_id is not None:
+        stmt = stmt.where(KpiRollup.data_id == data_id)
+    else:
+        unique_data = (
+            select(func.min(func.coalesce(Data.rows_owner_id, Data.id)))
+            .where(Data.status == DataStatus.READY.value)
+            .group_by(func.coalesce(Data.content_hash, Data.id))
+        )
+        stmt = stmt.where(KpiRollup.data_id.in_(unique_data))
+    if object_name is not None:
+        stmt = stmt.where(KpiRollup.object_name == object_name)
+    if start_date is not None:
+        start = pd.Timestamp(start_date).tz_localize(None).floor("D")
+        if freq == AggregateFreq.WEEK:
+            start -= pd.Timedelta(days=start.weekday())
+        elif freq == AggregateFreq.MONTH:
+            start = start.to_period("M").start_time
+        stmt = stmt.where(KpiRollup.period >= start.to_pydatetime())
+    if end_date is not None:
+        end = pd.Timestamp(end_date).tz_localize(None).floor("D")
+        # daily rollups of the last period after end_date are summed too
+        if freq == AggregateFreq.WEEK:
+            end += pd.Timedelta(days=6 - end.weekday())
+        elif freq == AggregateFreq.MONTH:
+            end = end.to_period("M").end_time.floor("D")
+        stmt = stmt.where(KpiRollup.period <= end.to_pydatetime())
+
+    sums = pd.DataFrame(session.execute(stmt).all(), columns=[key.name for key in keys] + KPI_COLUMNS)
+    return pd.concat([sums.drop(columns=KPI_COLUMNS), kpi_metrics(sums)], axis=1)
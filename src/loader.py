@@ -0,0 +1,290 @@
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.constants import BASE_DIR, FileType
+from src.database import Data, DataPoint
+from src.normalization import MEASURE_COLUMNS, CATEGORY_COLUMNS, normalize_frame, concat_frames
+
+try:
+    import python_calamine # noqa: F401 - Rust based reader, several times faster than openpyxl
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+
+def get_columnar_uri(content_hash: str) -> str:
+    return f"static/data/{content_hash}.arrow"
+
+
+def get_segment_locations(data_obj: Data) -> list[Path]:
+    """
+    Arrow files of rows appended to dataset after its columnar artifact was written (see src.ingest.append_rows).
+    Keys (object_name, date) of artifact and its segments never overlap, so they are merged by concatenation.
+    """
+    return [BASE_DIR / uri for uri in data_obj.columnar_segments or []]
+
+
+def get_rows_owner_id(data_obj: Data) -> str:
+    """Id data_point and rollup rows of dataset are stored under, datasets with the same content share them"""
+    return data_obj.rows_owner_id or data_obj.id
+
+
+def read_raw_frame(file_location: Path, extension: str) -> pd.DataFrame:
+    if extension == FileType.CSV:
+        df = pd.read_csv(file_location)
+    elif extension == FileType.JSON:
+        df = pd.read_json(file_location, convert_dates=False)
+    elif extension == FileType.EXCEL:
+        df = pd.read_excel(file_location, engine=EXCEL_ENGINE)
+    elif extension == FileType.NDJSON:
+        df = pd.read_json(file_location, lines=True, convert_dates=False)
+    else:
+        raise ValueError(f"Unsupported file extension: {extension}")
+    return df
+
+
+def iter_raw_chunks(file_location: Path, extension: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield raw file by chunks of chunk_size rows, only csv and ndjson are read lazily - other formats are parsed whole and sliced"""
+    if extension == FileType.CSV:
+        with pd.read_csv(file_location, chunksize=chunk_size) as reader:
+            yield from reader
+        return
+    if extension == FileType.NDJSON:
+        with pd.read_json(file_location, lines=True, convert_dates=False, chunksize=chunk_size) as reader:
+            yield from reader
+        return
+    df = read_raw_frame(file_location, extension)
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+OBJECT_OFFSETS_KEY = b"object_offsets"
+
+
+def write_columnar(df: pd.DataFrame, file_location: Path) -> None:
+    """
+    Write dataframe as uncompressed Arrow IPC file, so it can be memory mapped on read.
+    Rows are stored grouped by object_name and sorted by date inside every group,
+    [start, stop) row range of every object is kept in schema metadata (see read_columnar).
+    Written to a temporary name first and renamed, readers never see a half written file.
+    """
+    codes = df["object_name"].cat.codes.to_numpy()
+    order = np.lexsort((df.index.to_numpy(), codes))
+    if not (np.diff(order) > 0).all():
+        df = df.iloc[order]
+        codes = codes[order]
+    offsets = {}
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(codes)]):
+        if start < stop:
+            offsets[str(df["object_name"].iat[start])] = [int(start), int(stop)]
+    
+    table = pa.Table.from_pandas(df).combine_chunks()
+    table = table.replace_schema_metadata({
+        **table.schema.metadata,
+        OBJECT_OFFSETS_KEY: json.dumps(offsets).encode(),
+    })
+    temp_location = file_location.with_name(f".{file_location.name}.part")
+    with pa.OSFile(str(temp_location), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    temp_location.replace(file_location)
+
+
+def _to_datetime64(value: datetime) -> np.datetime64:
+    # dates of datasets are naive, aware filter values are compared by their wall time
+    return pd.Timestamp(value).tz_localize(None).to_datetime64()
+
+
+def _select_rows(
+    table: pa.Table,
+    start_date: datetime | None,
+    end_date: datetime | None,
+    object_name: str | None,
+) -> tuple[pa.Table, list[list[int]]]:
+    """
+    Resolve filters into [start, stop) row ranges of artifact table without copying it: object range is taken
+    from offsets in schema metadata and date range by binary search on memory mapped date column.
+    """
+    metadata = table.schema.metadata or {}
+    if OBJECT_OFFSETS_KEY in metadata:
+        offsets = json.loads(metadata[OBJECT_OFFSETS_KEY])
+        if object_name is not None:
+            offsets = {object_name: offsets[object_name]} if object_name in offsets else {}
+        blocks = list(offsets.values())
+    else:
+        # artifacts written before grouping by object are sorted only by date
+        blocks = [[0, table.num_rows]]
+        if object_name is not None:
+            table = table.filter(pc.equal(table.column("object_name").cast(pa.string()), object_name))
+            blocks = [[0, table.num_rows]]
+    
+    if start_date is not None or end_date is not None:
+        dates = table.column("date").combine_chunks().to_numpy(zero_copy_only=False)
+        for block in blocks:
+            start, stop = block
+            if start_date is not None:
+                start += int(np.searchsorted(dates[start:stop], _to_datetime64(start_date), side="left"))
+            if end_date is not None:
+                stop = block[0] + int(np.searchsorted(dates[block[0]:stop], _to_datetime64(end_date), side="right"))
+            block[:] = [start, max(start, stop)]
+    return table, [block for block in blocks if block[0] < block[1]]
+
+
+def read_columnar(
+    file_location: Path,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    object_name: str | None = None,
+    segment_locations: Sequence[Path] = (),
+) -> pd.DataFrame:
+    """
+    Read artifact as normalized frame, optionally only rows of object_name with date within [start_date, end_date].
+    File is memory mapped and selection is resolved before conversion to pandas, so only selected rows are copied.
+    Rows of segment_locations are merged in (see get_segment_locations).
+    """
+    df = _read_columnar_file(file_location, start_date, end_date, object_name)
+    if segment_locations:
+        segments = [_read_columnar_file(location, start_date, end_date, object_name) for location in segment_locations]
+        df = concat_frames([df, *segments])
+    return df
+
+
+def _read_columnar_file(
+    file_location: Path,
+    start_date: datetime | None,
+    end_date: datetime | None,
+    object_name: str | None,
+) -> pd.DataFrame:
+    with pa.memory_map(str(file_location), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    
+    table, blocks = _select_rows(table, start_date, end_date, object_name)
+    if blocks != [[0, table.num_rows]]:
+        slices = [table.slice(start, stop - start) for start, stop in blocks]
+        table = pa.concat_tables(slices) if slices else table.slice(0, 0)
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    if len(blocks) > 1 and not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind="stable")
+    return df
+
+
+def list_columnar_objects(file_location: Path, segment_locations: Sequence[Path] = ()) -> list[str]:
+    """Names of objects stored in artifact and its segments, read from schema metadata without touching rows"""
+    names = _list_columnar_file_objects(file_location)
+    for location in segment_locations:
+        names += [name for name in _list_columnar_file_objects(location) if name not in names]
+    return names
+
+
+def _list_columnar_file_objects(file_location: Path) -> list[str]:
+    with pa.memory_map(str(file_location), "r") as source:
+        reader = pa.ipc.open_file(source)
+        metadata = reader.schema.metadata or {}
+        if OBJECT_OFFSETS_KEY in metadata:
+            return list(json.loads(metadata[OBJECT_OFFSETS_KEY]))
+        # artifacts written before grouping by object
+        column = reader.read_all().column("object_name")
+        return sorted(str(name) for name in pc.unique(column.cast(pa.string())).to_pylist() if name is not None)
+
+
+def count_columnar_rows(
+    file_location: Path,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    object_name: str | None = None,
+    segment_locations: Sequence[Path] = (),
+) -> int:
+    """Number of artifact and segment rows selected by filters, nothing besides date column is read"""
+    total = 0
+    for location in [file_location, *segment_locations]:
+        with pa.memory_map(str(location), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+            _, blocks = _select_rows(table, start_date, end_date, object_name)
+        total += sum(stop - start for start, stop in blocks)
+    return total
+
+
+def iter_columnar_chunks(
+    file_location: Path,
+    chunk_size: int,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    object_name: str | None = None,
+    segment_locations: Sequence[Path] = (),
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield selected rows of artifact and then of its segments as normalized frames of at most chunk_size rows.
+    Chunks follow storage order (by object, then date), only one chunk is held in memory at a time.
+    """
+    for location in [file_location, *segment_locations]:
+        with pa.memory_map(str(location), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+            table, blocks = _select_rows(table, start_date, end_date, object_name)
+            for start, stop in blocks:
+                for chunk_start in range(start, stop, chunk_size):
+                    chunk = table.slice(chunk_start, min(chunk_size, stop - chunk_start))
+                    yield chunk.to_pandas(split_blocks=True)
+
+
+def load_data_points(
+    session: Session,
+    data_id: str,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    object_name: str | None = None,
+) -> pd.DataFrame:
+    """Read slice of dataset from data_point table as normalized frame, range is resolved by (data_id, object_name, ts) index"""
+    stmt = (
+        select(
+            DataPoint.ts.label("date"),
+            *(getattr(DataPoint, col) for col in CATEGORY_COLUMNS + MEASURE_COLUMNS),
+        )
+        .where(DataPoint.data_id == data_id)
+        .order_by(DataPoint.ts)
+    )
+    if object_name is not None:
+        stmt = stmt.where(DataPoint.object_name == object_name)
+    if start_date is not None:
+        stmt = stmt.where(DataPoint.ts >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(DataPoint.ts <= end_date)
+    df = pd.read_sql(stmt, session.connection(), index_col="date", parse_dates=["date"])
+    df = df.astype({col: "category" for col in CATEGORY_COLUMNS} | {col: "float32" for col in MEASURE_COLUMNS})
+    return df
+
+
+def load_frame(
+    session: Session,
+    data_obj: Data,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    object_name: str | None = None,
+) -> pd.DataFrame:
+    """
+    Single entrypoint for reading dataset as normalized frame (see normalize_frame), optionally filtered.
+    Columnar artifact is preferred, then data_point rows - original file is parsed
+    only for datasets uploaded before ingest stats were collected.
+    """
+    if data_obj.columnar_uri and (BASE_DIR / data_obj.columnar_uri).exists():
+        return read_columnar(BASE_DIR / data_obj.columnar_uri, start_date, end_date, object_name, get_segment_locations(data_obj))
+    if data_obj.row_count is not None:
+        return load_data_points(session, get_rows_owner_id(data_obj), start_date, end_date, object_name)
+    df = normalize_frame(read_raw_frame(BASE_DIR / data_obj.uri, data_obj.extension))
+    if object_name is not None:
+        df = df[df["object_name"] == object_name]
+    if start_date is not None or end_date is not None:
+        df = df.loc[
+            None if start_date is None else _to_datetime64(start_date):
+            None if end_date is None else _to_datetime64(end_date)
+        ]
+    return df
@@ -1,76 +1,203 @@
+import hashlib
+import pickle
+from typing import Any, Callable
+
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.metrics import mean_squared_error, mean_absolute_error
-from sklearn.model_selection import train_test_split
 import plotly.graph_objects as go
-from xgboost import XGBRegressor
+import xgboost as xgb
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
+
+from src.constants import MIN_PREDICTION_ROWS, SARIMA_APPEND_MAX_ROWS, XGBOOST_THREADS, AvailableModel
 
-from src.constants import AvailableModel
+# bump when results of create_prediction change, saved predictions of previous version are ignored
+PREDICTION_VERSION = 2
+# bump when fitting changes, fitted models of previous version are ignored
+MODEL_VERSION = 2
 
+MODEL_PARAMS = {
+    AvailableModel.SARIMA: {"order": (2, 1, 2), "seasonal_order": (1, 0, 1, 24)},
+    AvailableModel.FB_PROPHET: {"daily_seasonality": True, "yearly_seasonality": True, "weekly_seasonality": True, "regressors": ["cloudiness", "temperature"]},
+    AvailableModel.XGBOOST: {
+        "objective": "reg:squarederror",
+        "tree_method": "hist",
+        "num_boost_round": 100,
+        "look_back": 24,
+        "calendar_features": ["hour", "dayofweek", "month"],
+    },
+}
+# models whose fit can start from a model fitted on a prefix of the train window
+WARM_START_MODELS = {AvailableModel.SARIMA}
 
-def create_prediction(df: pd.DataFrame, model_type: AvailableModel, forecast_horizon: int):
-    # Data preprocessing
-    df = df.copy(deep=True)
-    df['fact'] = pd.to_numeric(df['fact'].str.replace(',', '.', regex=True), errors='coerce')
-    df['plan'] = pd.to_numeric(df['plan'].str.replace(',', '.', regex=True), errors='coerce')
-    df['cloudiness'] = pd.to_numeric(df['cloudiness'], errors='coerce')
-    df['temperature'] = pd.to_numeric(df['temperature'], errors='coerce')
+
+def prepare_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+    """Hourly frame used by models and size of its test part, df is normalized frame with sorted datetime index (see src.normalization)"""
     df = df.dropna(subset=['fact', 'cloudiness', 'temperature'])
     df = df.drop(columns=['object_name', 'unit'], errors='ignore')
-
-    # Ensure datetime index
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
     df = df.asfreq('h')
 
-    # Split data into train and test
-    series = df['fact']
-    total_size = len(series)
-    if total_size < 30:
-        raise ValueError("Insufficient data. At least 30 observations are required.")
-    
-    test_size = int(total_size * 0.3)
-    train, test = series.iloc[:-test_size], series.iloc[-test_size:]
-
-    if model_type == "SARIMA":
-        model = SARIMAX(train, order=(2, 1, 2), seasonal_order=(1, 0, 1, 24))
-        model_fit = model.fit(disp=False)
-        yhat = model_fit.forecast(steps=forecast_horizon)
-        predicted = yhat.tolist()
-        observed = test.iloc[:forecast_horizon].tolist()
-    
-    if model_type == "FB_PROPHET":
+    total_size = len(df)
+    if total_size < MIN_PREDICTION_ROWS:
+        raise ValueError(f"Insufficient data. At least {MIN_PREDICTION_ROWS} observations are required.")
+    return df, int(total_size * 0.3)
+
+
+def hash_rows(df: pd.DataFrame) -> str:
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()).hexdigest()
+
+
+def training_key(df: pd.DataFrame, test_size: int, model_type: AvailableModel) -> dict:
+    """
+    Everything fitted model depends on: hash of train rows, train window, model and its hyperparameters.
+    Forecast horizon is not part of it, so forecasts of any horizon reuse one fitted model.
+    """
+    train = df.iloc[:-test_size]
+    return {
+        "model_type": model_type.value,
+        "data_hash": hash_rows(train),
+        "train_start": train.index[0].isoformat(),
+        "train_end": train.index[-1].isoformat(),
+        "train_rows": len(train),
+        "params": MODEL_PARAMS[model_type],
+        "version": MODEL_VERSION,
+    }
+
+
+def _xgboost_features(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    XGBoost float32 features and target of prepared frame, features are filled into one preallocated matrix:
+    other measures of the hour, fact of look_back previous hours (lag 1 first) and calendar features.
+    Rows without full history or with missing values are dropped.
+    """
+    params = MODEL_PARAMS[AvailableModel.XGBOOST]
+    look_back = params["look_back"]
+    measures = df.columns.drop("fact")
+    fact = df["fact"].to_numpy(dtype=np.float32)
+    index = df.index[look_back:]
+
+    X = np.empty((len(index), len(measures) + look_back + len(params["calendar_features"])), dtype=np.float32)
+    X[:, :len(measures)] = df[measures].iloc[look_back:].to_numpy(dtype=np.float32)
+    # windows of fact[t - look_back:t] for every hour t, reversed so that column i is lag i + 1
+    X[:, len(measures):len(measures) + look_back] = sliding_window_view(fact[:-1], look_back)[:, ::-1]
+    for i, feature in enumerate(params["calendar_features"], start=len(measures) + look_back):
+        X[:, i] = getattr(index, feature)
+    # target keeps float64, it is also the observed values of the report
+    y = df["fact"].to_numpy(dtype=np.float64)[look_back:]
+
+    valid = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+    if valid.all():
+        return X, y
+    return X[valid], y[valid]
+
+
+def fit_model(df: pd.DataFrame, test_size: int, model_type: AvailableModel, warm_start: Any | None = None) -> Any:
+    """
+    Fit model on all rows of prepared frame except the last test_size ones.
+    warm_start is model of WARM_START_MODELS fitted on a prefix of the same train rows:
+    SARIMA optimizer starts from its parameters, or when at most SARIMA_APPEND_MAX_ROWS rows were added
+    its state is only extended by the new rows without re-estimating parameters.
+    """
+    params = MODEL_PARAMS[model_type]
+    if model_type == AvailableModel.SARIMA:
+        train = df['fact'].iloc[:-test_size]
+        model = SARIMAX(train, order=params["order"], seasonal_order=params["seasonal_order"])
+        if warm_start is not None and len(train) - warm_start.nobs <= SARIMA_APPEND_MAX_ROWS:
+            # like results.append(new rows) with previous parameters, which doesn't support low_memory
+            return model.filter(warm_start.params, cov_type="none", low_memory=True)
+        start_params = np.asarray(warm_start.params) if warm_start is not None else None
+        # per step filter and smoother output isn't needed for forecast, without it saved results are ~100x smaller
+        return model.fit(start_params=start_params, disp=False, low_memory=True)
+
+    if model_type == AvailableModel.FB_PROPHET:
         df_prophet = df.reset_index().rename(columns={"date": "ds", "fact": "y"})
-        prophet_model = Prophet(daily_seasonality=True, yearly_seasonality=True, weekly_seasonality=True)
-        prophet_model.add_regressor('cloudiness')
-        prophet_model.add_regressor('temperature')
+        prophet_model = Prophet(
+            daily_seasonality=params["daily_seasonality"],
+            yearly_seasonality=params["yearly_seasonality"],
+            weekly_seasonality=params["weekly_seasonality"],
+        )
+        for regressor in params["regressors"]:
+            prophet_model.add_regressor(regressor)
         prophet_model.fit(df_prophet[:-test_size])
+        return prophet_model
+
+    if model_type == AvailableModel.XGBOOST:
+        X, y = _xgboost_features(df)
+        # hist method bins features once, QuantileDMatrix stores only the bins instead of a copy of X
+        dtrain = xgb.QuantileDMatrix(X[:-test_size], y[:-test_size], nthread=XGBOOST_THREADS)
+        booster_params = {"objective": params["objective"], "tree_method": params["tree_method"], "nthread": XGBOOST_THREADS}
+        return xgb.train(booster_params, dtrain, num_boost_round=params["num_boost_round"])
+
+    raise ValueError(f"Unknown model type {model_type}")
+
 
-        future = prophet_model.make_future_dataframe(periods=forecast_horizon, freq='H')
-        future = pd.merge(future, df[['cloudiness', 'temperature']], left_on='ds', right_index=True, how='left')
-        forecast = prophet_model.predict(future)
+def forecast_model(fitted: Any, df: pd.DataFrame, test_size: int, model_type: AvailableModel, forecast_horizon: int) -> tuple[list, list]:
+    """Predicted and observed values for first forecast_horizon hours of test part"""
+    test = df['fact'].iloc[-test_size:]
+    observed = test.iloc[:forecast_horizon].tolist()
+    if model_type == AvailableModel.SARIMA:
+        predicted = fitted.forecast(steps=forecast_horizon).tolist()
+
+    elif model_type == AvailableModel.FB_PROPHET:
+        future = fitted.make_future_dataframe(periods=forecast_horizon, freq='H')
+        future = pd.merge(future, df[MODEL_PARAMS[model_type]["regressors"]], left_on='ds', right_index=True, how='left')
+        forecast = fitted.predict(future)
         predicted = forecast['yhat'].iloc[-forecast_horizon:].tolist()
-        observed = test.iloc[:forecast_horizon].tolist()
-    
-    if model_type == "XGBOOST":
-        lag_features = ['cloudiness', 'temperature']
-        df_lags = df.copy()
-        look_back = 24
-        for i in range(1, look_back + 1):
-            df_lags[f'lag_{i}'] = df_lags['fact'].shift(i)
-        df_lags = df_lags.dropna()
-        X = df_lags.drop(columns=['fact'])
-        y = df_lags['fact']
-        X_train, X_test = X.iloc[:-test_size], X.iloc[-test_size:]
-        y_train, y_test = y.iloc[:-test_size], y.iloc[-test_size:]
-
-        xgb_model = XGBRegressor(objective='reg:squarederror')
-        xgb_model.fit(X_train, y_train)
-        yhat = xgb_model.predict(X_test.iloc[:forecast_horizon])
-        predicted = yhat.tolist()
-        observed = y_test.iloc[:forecast_horizon].tolist()
+
+    elif model_type == AvailableModel.XGBOOST:
+        X, y = _xgboost_features(df)
+        X_test, y_test = X[-test_size:][:forecast_horizon], y[-test_size:][:forecast_horizon]
+        predicted = fitted.inplace_predict(X_test).tolist()
+        observed = y_test.tolist()
+
+    else:
+        raise ValueError(f"Unknown model type {model_type}")
+    return predicted, observed
+
+
+def dump_model(fitted: Any, model_type: AvailableModel) -> bytes:
+    if model_type == AvailableModel.FB_PROPHET:
+        return model_to_json(fitted).encode()
+    if model_type == AvailableModel.XGBOOST:
+        return bytes(fitted.save_raw("ubj"))
+    # statsmodels results are meant to be pickled, see SARIMAXResults.save
+    return pickle.dumps(fitted, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_model(content: bytes, model_type: AvailableModel) -> Any:
+    if model_type == AvailableModel.FB_PROPHET:
+        return model_from_json(content.decode())
+    if model_type == AvailableModel.XGBOOST:
+        booster = xgb.Booster(params={"nthread": XGBOOST_THREADS})
+        booster.load_model(bytearray(content))
+        return booster
+    return pickle.loads(content)
+
+
+def create_prediction(
+    df: pd.DataFrame,
+    model_type: AvailableModel,
+    forecast_horizon: int,
+    get_fitted_model: Callable[..., Any] | None = None,
+):
+    """
+    Forecast report of model fitted on first 70% of prepared frame.
+    get_fitted_model(training_key, fit, prefix_hash) may return previously fitted model instead of calling fit
+    or pass a model fitted on a prefix of train rows to fit as warm start (see src.registry).
+    """
+    df, test_size = prepare_frame(df)
+    test = df['fact'].iloc[-test_size:]
+
+    fit = lambda warm_start=None: fit_model(df, test_size, model_type, warm_start)
+    if get_fitted_model is None:
+        fitted = fit()
+    else:
+        prefix_hash = lambda rows: hash_rows(df.iloc[:rows])
+        fitted = get_fitted_model(training_key(df, test_size, model_type), fit, prefix_hash)
+    predicted, observed = forecast_model(fitted, df, test_size, model_type, forecast_horizon)
 
     # Calculate metrics
     mse = round(mean_squared_error(observed, predicted), 3)
@@ -0,0 +1,47 @@
+import pandas as pd
+
+MEASURE_COLUMNS = ["plan", "fact", "cloudiness", "temperature", "wind_speed"]
+CATEGORY_COLUMNS = ["object_name", "unit"]
+
+
+def parse_decimal(series: pd.Series) -> pd.Series:
+    """Parse numbers that may come as strings with decimal comma like "0,144" into float32, invalid values become NaN"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float32")
+    series = series.astype("string").str.replace(",", ".", regex=False)
+    return pd.to_numeric(series, errors="coerce").astype("float32")
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build canonical typed frame from raw parsed file:
+    sorted datetime64 "date" index, float32 measures and categorical object_name / unit.
+    Rows without valid date are dropped, other columns of the source file are ignored.
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(df["date"], errors="coerce"), name="date")
+    columns = {col: df[col].astype("category") for col in CATEGORY_COLUMNS}
+    columns.update({col: parse_decimal(df[col]) for col in MEASURE_COLUMNS})
+    normalized = pd.DataFrame({col: series.array for col, series in columns.items()}, index=index)
+    normalized = normalized[normalized.index.notna()]
+    if not normalized.index.is_monotonic_increasing:
+        normalized = normalized.sort_index(kind="stable")
+    return normalized
+
+
+def concat_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate normalized frames keeping canonical dtypes and sorted index"""
+    normalized = pd.concat(frames)
+    for col in CATEGORY_COLUMNS:
+        if not isinstance(normalized[col].dtype, pd.CategoricalDtype):
+            normalized[col] = normalized[col].astype("category")
+    if not normalized.index.is_monotonic_increasing:
+        normalized = normalized.sort_index(kind="stable")
+    return normalized
+
+
+def drop_duplicate_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """Keep only last row for every (object_name, date) key of normalized frame"""
+    duplicated = pd.MultiIndex.from_arrays([df["object_name"], df.index]).duplicated(keep="last")
+    if duplicated.any():
+        df = df[~duplicated]
+    return df
@@ -0,0 +1,99 @@
+import codecs
+import json
+import re
+from typing import Any
+
+# tail of buffer which may be a number or literal cut by chunk boundary
+PARTIAL_TOKEN_RE = re.compile(r"-?\d*\.?\d*(?:[eE][-+]?\d*)?")
+LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+
+
+class RecordStreamParser:
+    """
+    Incremental parser of DataFormat records coming as NDJSON lines or as one JSON array.
+    Bytes are fed as they arrive from request stream, complete records are returned right away,
+    so the whole body is never held in memory.
+    """
+    
+    def __init__(self, is_array: bool):
+        self.is_array = is_array
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.array_started = False
+        self.array_finished = False
+        self.expect_separator = False
+        self.record_count = 0
+    
+    def feed(self, chunk: bytes) -> list[dict[str, Any]]:
+        self.buffer += self.text_decoder.decode(chunk)
+        if self.is_array:
+            return self._parse_array()
+        return self._parse_lines(final=False)
+    
+    def close(self) -> list[dict[str, Any]]:
+        self.buffer += self.text_decoder.decode(b"", final=True)
+        if not self.is_array:
+            return self._parse_lines(final=True)
+        records = self._parse_array()
+        if not self.array_finished or self.buffer.strip():
+            raise ValueError("Некорректный JSON: массив записей не завершен")
+        return records
+    
+    def _parse_lines(self, final: bool) -> list[dict[str, Any]]:
+        lines = self.buffer.split("\n")
+        self.buffer = "" if final else lines.pop()
+        return [self._check_record(json.loads(line)) for line in lines if line.strip()]
+    
+    def _parse_array(self) -> list[dict[str, Any]]:
+        records = []
+        position = 0
+        while not self.array_finished:
+            while position < len(self.buffer) and self.buffer[position].isspace():
+                position += 1
+            if position == len(self.buffer):
+                break
+            char = self.buffer[position]
+            if not self.array_started:
+                if char != "[":
+                    raise ValueError("Некорректный JSON: ожидается массив записей")
+                self.array_started = True
+                position += 1
+            elif self.expect_separator:
+                if char not in ",]":
+                    raise ValueError("Некорректный JSON: записи массива должны разделяться запятой")
+                self.expect_separator = False
+                self.array_finished = char == "]"
+                position += 1
+            elif char == "]" and self.record_count == 0:
+                self.array_finished = True
+                position += 1
+            else:
+                try:
+                    record, position = self.decoder.raw_decode(self.buffer, position)
+                except json.JSONDecodeError as e:
+                    if self._is_incomplete(e):
+                        break # record is not received completely yet
+                    raise ValueError(f"Некорректный JSON в записи {self.record_count + 1}: {e.msg}")
+                records.append(self._check_record(record))
+                self.record_count += 1
+                self.expect_separator = True
+        self.buffer = self.buffer[position:]
+        return records
+    
+    def _is_incomplete(self, error: json.JSONDecodeError) -> bool:
+        """
+        Decoding failed only because buffer ends inside the record: error is at the end of buffer
+        or everything after it can still become valid token. Malformed record is reported right away,
+        otherwise the rest of body would be buffered waiting for its end.
+        """
+        if error.msg.startswith("Unterminated string"):
+            return True
+        tail = self.buffer[error.pos:].rstrip()
+        return PARTIAL_TOKEN_RE.fullmatch(tail) is not None or any(literal.startswith(tail) for literal in LITERALS)
+    
+    @staticmethod
+    def _check_record(record: Any) -> dict[str, Any]:
+        if not isinstance(record, dict):
+            raise ValueError("Некорректный JSON: каждая запись должна быть объектом")
+        return record
@@ -0,0 +1,143 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Callable
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from src.cache import LRUCache
+from src.constants import BASE_DIR, MODEL_DIR, MODEL_CACHE_SIZE, MODEL_CACHE_MAX_BYTES, MODEL_STORE_MAX_BYTES, AvailableModel
+from src.database import FittedModel
+from src.model import WARM_START_MODELS, dump_model, load_model
+
+# stored models checked for being fitted on a prefix of train rows
+WARM_START_CANDIDATES = 5
+
+# model id -> (fitted model, serialized size), lives in every prediction worker process
+model_cache = LRUCache(
+    max_size=MODEL_CACHE_SIZE,
+    max_weight=MODEL_CACHE_MAX_BYTES,
+    weigh=lambda item: item[1],
+)
+
+
+def get_model_id(training_key: dict) -> str:
+    payload = json.dumps(training_key, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _touch(session: Session, model_obj: FittedModel) -> None:
+    model_obj.used_at = datetime.now()
+    session.commit()
+
+
+def _load_fitted_model(session: Session, model_obj: FittedModel) -> Any | None:
+    """Fitted model of store row from memory or file, None if the file is gone"""
+    cached = model_cache.get(model_obj.id)
+    if cached is not None:
+        return cached[0]
+    try:
+        content = (BASE_DIR / model_obj.uri).read_bytes()
+    except FileNotFoundError:
+        # file is gone, row is stale
+        session.delete(model_obj)
+        session.commit()
+        return None
+    fitted = load_model(content, AvailableModel(model_obj.model_type))
+    model_cache.put(model_obj.id, (fitted, len(content)))
+    return fitted
+
+
+def find_warm_start(session: Session, training_key: dict, prefix_hash: Callable[[int], str]) -> Any | None:
+    """
+    Stored model of the same type and hyperparameters fitted on a prefix of train rows, e.g. on the dataset before
+    rows were appended to it. prefix_hash(rows) is hash of first rows of current train rows, candidates are
+    verified by it, so models of other datasets starting at the same hour are never used.
+    """
+    params = json.loads(json.dumps(training_key["params"]))
+    stmt = (
+        select(FittedModel)
+        .where(FittedModel.model_type == training_key["model_type"])
+        .where(FittedModel.train_start == datetime.fromisoformat(training_key["train_start"]))
+        .where(FittedModel.train_rows < training_key["train_rows"])
+        .order_by(FittedModel.train_rows.desc())
+        .limit(WARM_START_CANDIDATES)
+    )
+    for model_obj in session.execute(stmt).scalars().all():
+        if model_obj.params == params and prefix_hash(model_obj.train_rows) == model_obj.data_hash:
+            return _load_fitted_model(session, model_obj)
+    return None
+
+
+def get_fitted_model(
+    session: Session,
+    training_key: dict,
+    fit: Callable[[Any | None], Any],
+    prefix_hash: Callable[[int], str] | None = None,
+) -> Any:
+    """
+    Fitted model for training_key (see src.model.training_key) from memory, then from model store.
+    On miss fit(warm_start) is called, with a model fitted on a prefix of train rows for WARM_START_MODELS if one is stored.
+    Result is saved to the store, which is then trimmed to MODEL_STORE_MAX_BYTES.
+    """
+    model_id = get_model_id(training_key)
+    model_type = AvailableModel(training_key["model_type"])
+    model_obj = session.get(FittedModel, model_id)
+    if model_obj is not None:
+        fitted = _load_fitted_model(session, model_obj)
+        if fitted is not None:
+            _touch(session, model_obj)
+            return fitted
+
+    warm_start = None
+    if prefix_hash is not None and model_type in WARM_START_MODELS:
+        warm_start = find_warm_start(session, training_key, prefix_hash)
+    fitted = fit(warm_start)
+    content = dump_model(fitted, model_type)
+    save_fitted_model(session, model_id, training_key, content)
+    model_cache.put(model_id, (fitted, len(content)))
+    return fitted
+
+
+def save_fitted_model(session: Session, model_id: str, training_key: dict, content: bytes) -> None:
+    uri = f"static/models/{model_id}.model"
+    file_location = MODEL_DIR / f"{model_id}.model"
+    tmp_location = file_location.with_name(f"{file_location.name}.tmp")
+    tmp_location.write_bytes(content)
+    tmp_location.replace(file_location)
+    # another worker may have fitted the same model meanwhile, both wrote equal content
+    session.merge(FittedModel(
+        id=model_id,
+        model_type=training_key["model_type"],
+        data_hash=training_key["data_hash"],
+        train_start=datetime.fromisoformat(training_key["train_start"]),
+        train_end=datetime.fromisoformat(training_key["train_end"]),
+        train_rows=training_key["train_rows"],
+        params=training_key["params"],
+        uri=uri,
+        size=len(content),
+        used_at=datetime.now(),
+    ))
+    session.commit()
+    trim_model_store(session, keep_id=model_id)
+
+
+def trim_model_store(session: Session, keep_id: str | None = None) -> None:
+    """Remove least recently used fitted models until store fits into MODEL_STORE_MAX_BYTES"""
+    total = session.execute(select(func.coalesce(func.sum(FittedModel.size), 0))).scalar_one()
+    if total <= MODEL_STORE_MAX_BYTES:
+        return
+    stmt = select(FittedModel).order_by(FittedModel.used_at)
+    if keep_id is not None:
+        stmt = stmt.where(FittedModel.id != keep_id)
+    removed_uris = []
+    for model_obj in session.execute(stmt).scalars():
+        if total <= MODEL_STORE_MAX_BYTES:
+            break
+        total -= model_obj.size
+        removed_uris.append(model_obj.uri)
+        session.delete(model_obj)
+    session.commit()
+    for uri in removed_uris:
+        (BASE_DIR / uri).unlink(missing_ok=True)
@@ -0,0 +1,153 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, delete, exists, literal
+from sqlalchemy.orm import Session
+
+from src.constants import AggregateFreq, AggregateFunction
+from src.database import DataRollup, KpiRollup
+from src.kpi import KPI_COLUMNS, insert_kpi
+from src.normalization import MEASURE_COLUMNS
+
+ROLLUP_AGGREGATES = ["count", "sum", "min", "max"]
+ROLLUP_COLUMNS = [f"{col}_{agg}" for col in MEASURE_COLUMNS for agg in ROLLUP_AGGREGATES]
+# how rollup of shorter period is folded into longer one
+ROLLUP_MERGE = {f"{col}_{agg}": "sum" if agg in ("count", "sum") else agg for col in MEASURE_COLUMNS for agg in ROLLUP_AGGREGATES}
+
+
+def compute_daily_rollups(df: pd.DataFrame) -> pd.DataFrame:
+    """Rollups of normalized frame per (object_name, day), hourly rows are read once in one grouped pass"""
+    measures = df[MEASURE_COLUMNS].astype(np.float64) # sums are accumulated in float64
+    keys = [df["object_name"].astype(str).rename("object_name"), df.index.floor("D").rename("period")]
+    daily = measures.groupby(keys, sort=False).agg(ROLLUP_AGGREGATES)
+    daily.columns = [f"{col}_{agg}" for col, agg in daily.columns]
+    return daily.reset_index()
+
+
+def merge_rollups(rollups: pd.DataFrame, freq: AggregateFreq) -> pd.DataFrame:
+    """Fold daily rollups into weekly or monthly ones"""
+    if freq == AggregateFreq.WEEK:
+        period = rollups["period"] - pd.to_timedelta(rollups["period"].dt.weekday, unit="D")
+    else:
+        period = rollups["period"].dt.to_period("M").dt.start_time
+    merged = rollups.groupby([rollups["object_name"], period.rename("period")], sort=False).agg(ROLLUP_MERGE)
+    return merged.reset_index()
+
+
+def compute_rollups(df: pd.DataFrame) -> dict[AggregateFreq, pd.DataFrame]:
+    daily = compute_daily_rollups(df)
+    return {AggregateFreq.DAY: daily, AggregateFreq.MONTH: merge_rollups(daily, AggregateFreq.MONTH)}
+
+
+def insert_rollups(session: Session, data_id: str, df: pd.DataFrame) -> None:
+    """Precompute daily and monthly rollups and daily KPI rollups of dataset rows"""
+    insert_kpi(session, data_id, df)
+    for freq, rollups in compute_rollups(df).items():
+        rollups = rollups.astype({col: "int64" for col in ROLLUP_COLUMNS if col.endswith("_count")})
+        records = rollups.astype(object).where(rollups.notna(), None).to_dict("records")
+        if records:
+            session.execute(insert(DataRollup.__table__), [{"data_id": data_id, "freq": freq.value, **record} for record in records])
+
+
+def has_rollups(session: Session, data_id: str) -> bool:
+    stmt = select(exists().where(DataRollup.data_id == data_id), exists().where(KpiRollup.data_id == data_id))
+    return all(session.execute(stmt).one())
+
+
+def delete_rollups(session: Session, data_id: str) -> None:
+    session.execute(delete(DataRollup).where(DataRollup.data_id == data_id))
+    session.execute(delete(KpiRollup).where(KpiRollup.data_id == data_id))
+
+
+def rebuild_rollups(session: Session, data_id: str, df: pd.DataFrame) -> None:
+    delete_rollups(session, data_id)
+    insert_rollups(session, data_id, df)
+
+
+def update_rollups(session: Session, data_id: str, df: pd.DataFrame, changed_df: pd.DataFrame) -> None:
+    """
+    Recompute rollups after rows of changed_df were merged into dataset frame df.
+    Only months between first and last changed row of changed objects are rebuilt.
+    Datasets without rollups yet get them for all rows.
+    """
+    if not has_rollups(session, data_id):
+        rebuild_rollups(session, data_id, df)
+        return
+    object_names = changed_df["object_name"].astype(str).unique().tolist()
+    start = changed_df.index[0].to_period("M").start_time
+    # start of the next month, Period.end_time has nanoseconds which datetime can't hold
+    end = (changed_df.index[-1].to_period("M") + 1).start_time
+    for model in (DataRollup, KpiRollup):
+        session.execute(
+            delete(model)
+            .where(model.data_id == data_id)
+            .where(model.object_name.in_(object_names))
+            .where(model.period >= start.to_pydatetime())
+            .where(model.period < end.to_pydatetime())
+        )
+    selected = df["object_name"].astype(str).isin(object_names).to_numpy() & (df.index >= start) & (df.index < end)
+    insert_rollups(session, data_id, df[selected])
+
+
+def copy_rollups(session: Session, source_id: str, target_id: str) -> None:
+    for model, columns in (
+        (DataRollup, ["freq", "object_name", "period", *ROLLUP_COLUMNS]),
+        (KpiRollup, ["object_name", "period", *KPI_COLUMNS]),
+    ):
+        stmt = insert(model).from_select(
+            ["data_id", *columns],
+            select(literal(target_id), *(getattr(model, col) for col in columns)).where(model.data_id == source_id),
+        )
+        session.execute(stmt)
+
+
+def load_aggregate(
+    session: Session,
+    data_id: str,
+    freq: AggregateFreq,
+    functions: list[AggregateFunction],
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    object_name: str | None = None,
+) -> pd.DataFrame:
+    """
+    Measures of dataset aggregated per object and period, read from rollups only.
+    Periods are included whole when they overlap [start_date, end_date].
+    Returns columns object_name, period and <measure>_<function> for every measure and function.
+    """
+    stored_freq = AggregateFreq.MONTH if freq == AggregateFreq.MONTH else AggregateFreq.DAY
+    stmt = (
+        select(DataRollup.object_name, DataRollup.period, *(getattr(DataRollup, col) for col in ROLLUP_COLUMNS))
+        .where(DataRollup.data_id == data_id)
+        .where(DataRollup.freq == stored_freq.value)
+        .order_by(DataRollup.object_name, DataRollup.period)
+    )
+    if object_name is not None:
+        stmt = stmt.where(DataRollup.object_name == object_name)
+    if start_date is not None:
+        start = pd.Timestamp(start_date).tz_localize(None)
+        start = start.to_period("M").start_time if freq == AggregateFreq.MONTH else start.floor("D")
+        if freq == AggregateFreq.WEEK:
+            start -= pd.Timedelta(days=start.weekday())
+        stmt = stmt.where(DataRollup.period >= start.to_pydatetime())
+    if end_date is not None:
+        end = pd.Timestamp(end_date).tz_localize(None)
+        if freq == AggregateFreq.WEEK:
+            # weeks are merged from daily rollups, so days of the last week after end_date are read too
+            end = end.floor("D") + pd.Timedelta(days=6 - end.weekday())
+        stmt = stmt.where(DataRollup.period <= end.to_pydatetime())
+    rollups = pd.read_sql(stmt, session.connection(), parse_dates=["period"])
+    if freq == AggregateFreq.WEEK:
+        rollups = merge_rollups(rollups, freq).sort_values(["object_name", "period"], ignore_index=True)
+    
+    result = rollups[["object_name", "period"]].copy()
+    for col in MEASURE_COLUMNS:
+        count = rollups[f"{col}_count"]
+        for function in functions:
+            if function == AggregateFunction.MEAN:
+                values = rollups[f"{col}_sum"] / count.where(count > 0)
+            else:
+                values = rollups[f"{col}_{function.value}"].where(count > 0)
+            result[f"{col}_{function.value}"] = values
+    return result
@@ -1,9 +1,20 @@
 from datetime import datetime, date
+from typing import Any
 from uuid import UUID
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator, field_validator
 
-from src.constants import AvailableModel, FileType
+from src.constants import (
+    AvailableModel,
+    AnalysisMode,
+    AggregateFreq,
+    AggregateFunction,
+    DataStatus,
+    FileType,
+    PredictionStatus,
+    ANALYSIS_MAX_POINTS,
+    ANALYSIS_MIN_POINTS,
+)
 
 
 class DataFormat(BaseModel):
@@ -27,15 +38,89 @@ class DataRead(BaseModel):
     data_type: FileType
     original_name: str
     size: int
+    content_hash: str | None = None
+    row_count: int | None = None
+    min_date: datetime | None = None
+    max_date: datetime | None = None
+    status: DataStatus = DataStatus.READY
+    status_detail: Any = None
     created_at: datetime
     updated_at: datetime
     
 
+class BatchUploadResult(BaseModel):
+    original_name: str
+    data: DataRead | None = None
+    error: Any = Field(default=None, description="Причина ошибки загрузки файла, формат как detail у HTTPException")
+
+
+class ValidationErrorItem(BaseModel):
+    row: int = Field(description="Номер строки данных в файле, начиная с 0 (без учета заголовка)")
+    column: str
+    value: str | None = None
+    message: str
+
+
+class ValidationReport(BaseModel):
+    valid: bool
+    row_count: int = Field(description="Количество проверенных строк, при досрочной остановке - до места остановки")
+    min_date: datetime | None = None
+    max_date: datetime | None = None
+    errors: list[ValidationErrorItem] = []
+    truncated: bool = Field(default=False, description="Проверка остановлена после достижения лимита ошибок")
+    
+
 class AnalysisFilterParams(BaseModel):
     start_date: datetime | None = None # mindate=datetime(2023, 1, 1),
     end_date: datetime | None = None # maxdate=datetime(2024, 7, 1)
     object_name: str | None = None
     
+    @model_validator(mode="after")
+    def check_date_range(self):
+        if (
+            self.start_date is not None and self.end_date is not None
+            and self.start_date.replace(tzinfo=None) > self.end_date.replace(tzinfo=None)
+        ):
+            raise ValueError("start_date должна быть не позже end_date")
+        return self
+
+
+class AnalysisParams(AnalysisFilterParams):
+    mode: AnalysisMode = Field(default=AnalysisMode.HTML, description="Формат результата")
+    max_points: int = Field(default=ANALYSIS_MAX_POINTS, ge=0, description="Максимальное количество точек графика план/факт, 0 - без ограничения")
+    grouped: bool = Field(default=False, description="Отдельный анализ для каждого объекта")
+    
+    @field_validator("max_points")
+    @classmethod
+    def check_max_points(cls, value: int) -> int:
+        if 0 < value < ANALYSIS_MIN_POINTS:
+            raise ValueError(f"max_points должно быть 0 или не меньше {ANALYSIS_MIN_POINTS}")
+        return value
+    
+
+class AggregateParams(AnalysisFilterParams):
+    freq: AggregateFreq = Field(default=AggregateFreq.DAY, description="Период агрегации: D - день, W - неделя, M - месяц")
+    agg: str = Field(default=AggregateFunction.MEAN.value, description="Функции агрегации через запятую: mean, sum, min, max")
+    
+    @field_validator("agg")
+    @classmethod
+    def check_agg(cls, value: str) -> str:
+        allowed = [function.value for function in AggregateFunction]
+        for name in value.split(","):
+            if name.strip() not in allowed:
+                raise ValueError(f"Недопустимая функция агрегации: {name.strip()}, допустимые: {', '.join(allowed)}")
+        return value
+    
+    @property
+    def functions(self) -> list[AggregateFunction]:
+        return list(dict.fromkeys(AggregateFunction(name.strip()) for name in self.agg.split(",")))
+
+
+class KpiParams(AnalysisFilterParams):
+    freq: AggregateFreq = Field(default=AggregateFreq.DAY, description="Период: D - день, W - неделя, M - месяц")
+    data_id: UUID | None = Field(default=None, description="Только один набор данных, по умолчанию все готовые наборы")
+    by_object: bool = Field(default=True, description="Отдельно для каждого объекта, иначе суммарно по всем объектам")
+
 
 class PredictionConfig(BaseModel):
     # data_id: UUID
@@ -43,4 +128,15 @@ class PredictionConfig(BaseModel):
     forecast_horizon: int = Field(default=48, ge=24, le=128, description="Горизонт прогнозирования в часах")
 
 
-# class PredictionRead:
+class PredictionRead(BaseModel):
+    prediction_id: str
+    data_id: str
+    status: PredictionStatus
+    params: dict[str, Any] = Field(description="model_type, forecast_horizon и фильтры данных для обучения")
+    uri_path: str | None = Field(default=None, description="Отчет прогноза, доступен после успешного завершения")
+    error: str | None = Field(default=None, description="Причина ошибки прогнозирования")
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    queue_time: float | None = Field(default=None, description="Время ожидания в очереди в секундах")
+    run_time: float | None = Field(default=None, description="Время расчета в секундах")
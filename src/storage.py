@@ -0,0 +1,72 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import HTTPException, status
+
+from src.constants import UPLOAD_CHUNK_SIZE, MAX_UPLOAD_SIZE
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    path: Path
+    size: int
+    sha256: str
+
+
+class UploadWriter:
+    """
+    Incrementally write upload into directory with rolling sha256 digest and size limit.
+    Data goes to a temporary file in the same directory, so the final os.replace in commit is atomic
+    and a partially written upload never appears under its real name.
+    """
+    
+    def __init__(self, directory: Path):
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.temp_file = tempfile.NamedTemporaryFile(dir=directory, prefix=".upload-", suffix=".part", delete=False)
+    
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > MAX_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Размер файла превышает допустимый лимит в {MAX_UPLOAD_SIZE} байт"
+            )
+        self.digest.update(chunk)
+        self.temp_file.write(chunk)
+    
+    def copy_from(self, file_object: BinaryIO) -> None:
+        while chunk := file_object.read(UPLOAD_CHUNK_SIZE):
+            self.write(chunk)
+    
+    def commit(self, file_location: Path) -> StoredFile:
+        """file_location must be in the same directory as writer, can be chosen after digest is known"""
+        self.temp_file.flush()
+        os.fsync(self.temp_file.fileno())
+        self.temp_file.close()
+        if self.size == 0:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Нельзя загружать пустой файл"
+            )
+        os.replace(self.temp_file.name, file_location)
+        return StoredFile(path=file_location, size=self.size, sha256=self.digest.hexdigest())
+    
+    def abort(self) -> None:
+        self.temp_file.close()
+        Path(self.temp_file.name).unlink(missing_ok=True)
+
+
+def save_upload(file_object: BinaryIO, file_location: Path) -> StoredFile:
+    """Copy uploaded stream to file_location in chunks of UPLOAD_CHUNK_SIZE bytes"""
+    writer = UploadWriter(file_location.parent)
+    try:
+        writer.copy_from(file_object)
+        return writer.commit(file_location)
+    except BaseException:
+        writer.abort()
+        raise
@@ -0,0 +1,152 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.analysis import (
+    HOURS_IN_GRID,
+    DAYS_IN_GRID,
+    calendar_keys,
+    calendar_sums,
+    calendar_surface,
+    plan_fact_sums,
+    plan_fact_stats,
+    compute_analysis,
+)
+from src.constants import ANALYSIS_STREAMING_MIN_ROWS, ANALYSIS_CHUNK_SIZE, ANALYSIS_MAX_POINTS
+from src.downsampling import downsample_series
+from src.loader import read_columnar, count_columnar_rows, iter_columnar_chunks
+from src.normalization import MEASURE_COLUMNS
+
+
+class CorrelationAccumulator:
+    """
+    Pairwise complete correlation of columns accumulated chunk by chunk, result matches DataFrame.corr().
+    For every pair (i, j) count, means, second moments and co-moment over rows where both columns are present
+    are kept as k x k matrices and chunks are merged with the parallel formulas of Chan et al.
+    """
+
+    def __init__(self, columns: int):
+        self.count = np.zeros((columns, columns))
+        self.mean = np.zeros((columns, columns)) # mean[i, j] is mean of column i over rows where i and j are present
+        self.m2 = np.zeros((columns, columns))
+        self.comoment = np.zeros((columns, columns))
+
+    def update(self, values: np.ndarray) -> None:
+        """values is (rows, columns) array of one chunk, NaN marks missing value"""
+        values = values.astype(np.float64, copy=False)
+        present = ~np.isnan(values)
+        weights = present.astype(np.float64)
+        # values are shifted by chunk column means before summing squares to avoid cancellation
+        present_count = weights.sum(axis=0)
+        shift = np.divide(
+            np.where(present, values, 0).sum(axis=0),
+            present_count,
+            out=np.zeros(values.shape[1]),
+            where=present_count > 0,
+        )
+        shifted = np.where(present, values - shift, 0)
+
+        count = weights.T @ weights
+        sums = shifted.T @ weights
+        mean = np.divide(sums, count, out=np.zeros_like(sums), where=count > 0)
+        m2 = (shifted * shifted).T @ weights - sums * mean
+        comoment = shifted.T @ shifted - sums * mean.T
+        self._merge(count, mean + shift[:, None], m2, comoment)
+
+    def _merge(self, count: np.ndarray, mean: np.ndarray, m2: np.ndarray, comoment: np.ndarray) -> None:
+        total = self.count + count
+        delta = np.where(count > 0, mean - self.mean, 0)
+        weight = np.divide(count, total, out=np.zeros_like(total), where=total > 0)
+        factor = self.count * weight
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + m2 + delta * delta * factor
+        self.comoment = self.comoment + comoment + delta * delta.T * factor
+        self.count = total
+
+    def correlation(self) -> np.ndarray:
+        denominator = np.sqrt(self.m2 * self.m2.T)
+        result = np.full_like(denominator, np.nan)
+        np.divide(self.comoment, denominator, out=result, where=denominator > 0)
+        return result
+
+
+def compute_analysis_streaming(chunks: Iterable[pd.DataFrame], total_rows: int, max_points: int) -> dict:
+    """
+    Out-of-core counterpart of src.analysis.compute_analysis for chunks of normalized frame.
+    Only sufficient statistics are kept between chunks: co-moments for correlation matrix and sum / count grids
+    for surfaces. Series are downsampled per chunk, every chunk gets share of max_points proportional to its rows.
+    Memory use doesn't depend on total_rows as long as max_points is set.
+    """
+    correlation = CorrelationAccumulator(len(MEASURE_COLUMNS))
+    surfaces = {
+        col: [np.zeros((HOURS_IN_GRID, DAYS_IN_GRID)), np.zeros((HOURS_IN_GRID, DAYS_IN_GRID), dtype=np.intp)]
+        for col in ("temperature", "fact")
+    }
+    stats_sums = np.zeros(6)
+    dates, plan, fact = [], [], []
+    seen_rows = points = 0
+    for chunk in chunks:
+        correlation.update(chunk[MEASURE_COLUMNS].to_numpy(dtype=np.float64))
+        keys = calendar_keys(chunk.index)
+        for col, accumulated in surfaces.items():
+            sums, counts = calendar_sums(keys, chunk[col].to_numpy())
+            accumulated[0] += sums
+            accumulated[1] += counts
+
+        chunk_dates = chunk.index.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        chunk_series = {col: chunk[col].to_numpy(dtype=np.float32) for col in ("plan", "fact")}
+        stats_sums += plan_fact_sums(chunk_series["plan"], chunk_series["fact"])
+        if max_points > 0:
+            # share of chunk is the part of max_points its rows end at, so shares never add up above max_points
+            budget = min(max_points * (seen_rows + len(chunk)) // max(total_rows, 1), max_points) - points
+            seen_rows += len(chunk)
+            rows = downsample_series(chunk_dates, chunk_series, budget) if budget > 0 else np.empty(0, dtype=np.intp)
+            points += len(rows)
+            chunk_dates = chunk_dates[rows]
+            chunk_series = {col: values[rows] for col, values in chunk_series.items()}
+        dates.append(chunk_dates)
+        plan.append(chunk_series["plan"])
+        fact.append(chunk_series["fact"])
+
+    # chunks of different objects overlap in time
+    dates = np.concatenate(dates) if dates else np.empty(0, dtype=np.int64)
+    order = np.argsort(dates, kind="stable")
+    return {
+        "correlation": {
+            "columns": list(MEASURE_COLUMNS),
+            "values": correlation.correlation().astype(np.float32),
+        },
+        "weather": calendar_surface(*surfaces["temperature"]),
+        "solar": calendar_surface(*surfaces["fact"]),
+        "series": {
+            # milliseconds since epoch, as expected by javascript Date
+            "date": dates[order],
+            "plan": np.concatenate(plan)[order] if plan else np.empty(0, dtype=np.float32),
+            "fact": np.concatenate(fact)[order] if fact else np.empty(0, dtype=np.float32),
+        },
+        "stats": plan_fact_stats(stats_sums),
+    }
+
+
+def analyze_columnar(
+    file_location: Path,
+    max_points: int,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    object_name: str | None = None,
+    segment_locations: Sequence[Path] = (),
+) -> dict | None:
+    """
+    Analysis of rows of columnar artifact and its segments selected by filters, None if nothing is selected.
+    Large selections are analyzed out-of-core chunk by chunk, plan/fact series are always downsampled then.
+    """
+    total_rows = count_columnar_rows(file_location, start_date, end_date, object_name, segment_locations)
+    if total_rows == 0:
+        return None
+    if total_rows >= ANALYSIS_STREAMING_MIN_ROWS:
+        chunks = iter_columnar_chunks(file_location, ANALYSIS_CHUNK_SIZE, start_date, end_date, object_name, segment_locations)
+        return compute_analysis_streaming(chunks, total_rows, max_points or ANALYSIS_MAX_POINTS)
+    return compute_analysis(read_columnar(file_location, start_date, end_date, object_name, segment_locations), max_points)
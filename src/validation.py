@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pydantic import TypeAdapter, ValidationError
+
+from src.constants import VALIDATION_CHUNK_SIZE, VALIDATION_MAX_ERRORS
+from src.loader import iter_raw_chunks
+from src.normalization import MEASURE_COLUMNS, CATEGORY_COLUMNS, parse_decimal, normalize_frame, concat_frames
+from src.schemas import DataFormat, ValidationErrorItem, ValidationReport
+
+REQUIRED_COLUMNS = list(DataFormat.model_fields)
+
+DATA_FORMAT_LIST_ADAPTER = TypeAdapter(list[DataFormat])
+
+
+def _mask_errors(chunk: pd.DataFrame, column: str, mask: np.ndarray, message: str, offset: int) -> list[ValidationErrorItem]:
+    positions = np.flatnonzero(mask)
+    values = chunk[column].iloc[positions]
+    return [
+        ValidationErrorItem(
+            row=offset + int(position),
+            column=column,
+            value=None if pd.isna(value) else str(value),
+            message=message,
+        )
+        for position, value in zip(positions, values)
+    ]
+
+
+def validate_chunk(chunk: pd.DataFrame, offset: int) -> list[ValidationErrorItem]:
+    """Vectorized check of DataFormat rules over chunk of raw rows, offset is position of first row in file"""
+    errors = []
+    missing = chunk.isna().to_numpy()
+    for col in REQUIRED_COLUMNS:
+        col_missing = missing[:, chunk.columns.get_loc(col)]
+        if col == "date":
+            invalid = pd.to_datetime(chunk[col], errors="coerce").isna().to_numpy() & ~col_missing
+            message = "Некорректный формат даты"
+        elif col in MEASURE_COLUMNS:
+            invalid = parse_decimal(chunk[col]).isna().to_numpy() & ~col_missing
+            message = "Значение должно быть числом"
+        elif col in CATEGORY_COLUMNS:
+            invalid = (chunk[col].astype("string").str.strip() == "").fillna(False).to_numpy()
+            message = "Значение не должно быть пустым"
+        errors.extend(_mask_errors(chunk, col, col_missing, "Отсутствует значение", offset))
+        errors.extend(_mask_errors(chunk, col, invalid, message, offset))
+    errors.sort(key=lambda error: error.row)
+    return errors
+
+
+def validate_file(
+    file_location: Path,
+    extension: str,
+    max_errors: int = VALIDATION_MAX_ERRORS,
+) -> tuple[ValidationReport, pd.DataFrame | None]:
+    """
+    Read file by chunks and validate content against DataFormat, stops at first max_errors errors.
+    Valid chunks are normalized on the way, so the file is parsed only once:
+    returns report and normalized frame (None if file is invalid).
+    """
+    errors: list[ValidationErrorItem] = []
+    frames: list[pd.DataFrame] = []
+    row_count = 0
+    truncated = False
+    for chunk in iter_raw_chunks(file_location, extension, VALIDATION_CHUNK_SIZE):
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+        if missing_columns:
+            errors.extend(
+                ValidationErrorItem(row=row_count, column=col, message="Отсутствует обязательная колонка")
+                for col in missing_columns
+            )
+            break
+        errors.extend(validate_chunk(chunk, offset=row_count))
+        row_count += len(chunk)
+        if len(errors) >= max_errors:
+            truncated = True
+            errors = errors[:max_errors]
+            break
+        if not errors:
+            frames.append(normalize_frame(chunk))
+    if not errors and row_count == 0:
+        errors.append(ValidationErrorItem(row=0, column="date", message="Файл не содержит записей"))
+    
+    if errors:
+        return ValidationReport(valid=False, row_count=row_count, errors=errors, truncated=truncated), None
+    df = concat_frames(frames)
+    report = ValidationReport(
+        valid=True,
+        row_count=len(df),
+        min_date=df.index[0],
+        max_date=df.index[-1],
+    )
+    return report, df
+
+
+def validate_records(records: list[dict], offset: int) -> tuple[list[DataFormat], list[ValidationErrorItem]]:
+    """Validate batch of already parsed records (json body), offset is position of first record in request"""
+    try:
+        return DATA_FORMAT_LIST_ADAPTER.validate_python(records), []
+    except ValidationError as e:
+        errors = [
+            ValidationErrorItem(
+                row=offset + error["loc"][0],
+                column=str(error["loc"][1]) if len(error["loc"]) > 1 else "",
+                value=None if error["type"] == "missing" else str(error["input"]),
+                message=error["msg"],
+            )
+            for error in e.errors()
+        ]
+        return [], errors
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import delete, exists, not_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.constants import WORKER_HEARTBEAT_TIMEOUT
+from src.database import Session as DBSession, Worker
+
+# identity of this API process, saved on background work it starts; pool processes never use it
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+_process_pools: dict[str, ProcessPoolExecutor] = {}
+
+
+def get_process_pool(name: str, max_workers: int) -> ProcessPoolExecutor:
+    """
+    Lazily created named process pool shared by requests, max_workers bounds CPU used by this kind of work.
+    Workers are spawned rather than forked, so they don't inherit threads and database connections of API process.
+    """
+    pool = _process_pools.get(name)
+    # pool becomes unusable if any worker dies (e.g. killed by OOM), then it's replaced by a new one
+    if pool is None or pool._broken:
+        _process_pools[name] = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pools[name]
+
+
+def shutdown_process_pools() -> None:
+    for pool in _process_pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _process_pools.clear()
+
+
+def send_heartbeat() -> None:
+    """Register this API process or confirm it's alive, see is_worker_gone"""
+    with DBSession() as session:
+        now = datetime.now()
+        stmt = (
+            sqlite_insert(Worker)
+            .values(id=WORKER_ID, started_at=now, heartbeat_at=now)
+            .on_conflict_do_update(index_elements=[Worker.id], set_={"heartbeat_at": now})
+        )
+        session.execute(stmt)
+        session.commit()
+
+
+def remove_worker() -> None:
+    """Called on shutdown, unfinished work of this process is failed by the next heartbeat of any other one"""
+    with DBSession() as session:
+        session.execute(delete(Worker).where(Worker.id == WORKER_ID))
+        session.commit()
+
+
+def is_worker_gone(worker_id_column):
+    """
+    SQL condition on column of worker_id: API process which started the work stopped or crashed.
+    Rows without worker were started before workers were recorded.
+    """
+    alive = (
+        exists()
+        .where(Worker.id == worker_id_column)
+        .where(Worker.heartbeat_at >= datetime.now() - timedelta(seconds=WORKER_HEARTBEAT_TIMEOUT))
+    )
+    return worker_id_column.is_(None) | not_(alive)
+
+
+def remove_gone_workers() -> None:
+    with DBSession() as session:
+        session.execute(delete(Worker).where(Worker.heartbeat_at < datetime.now() - timedelta(seconds=WORKER_HEARTBEAT_TIMEOUT)))
+        session.commit()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+from src.downsampling import downsample_series
+from src.schemas import AnalysisParams
+from src.streaming import compute_analysis_streaming
+
+
+def make_series(rows: int) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    rng = np.random.default_rng(0)
+    return np.arange(rows, dtype=np.int64), {"plan": rng.normal(size=rows), "fact": rng.normal(size=rows)}
+
+
+@pytest.mark.parametrize("max_points", [1, 2, 3, 5, 6, 7, 100])
+def test_downsample_series_keeps_at_most_max_points(max_points):
+    x, columns = make_series(1000)
+    rows = downsample_series(x, columns, max_points)
+    assert 0 < len(rows) <= max_points
+    assert np.all(np.diff(rows) > 0)
+
+
+def test_downsample_series_keeps_short_series():
+    x, columns = make_series(10)
+    assert len(downsample_series(x, columns, 10)) == 10
+    assert len(downsample_series(x, columns, 0)) == 10
+
+
+@pytest.mark.parametrize("max_points", [6, 50])
+def test_streaming_series_keeps_at_most_max_points(max_points):
+    index = pd.date_range("2024-01-01", periods=2000, freq="h", name="date")
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({col: rng.normal(size=len(index)) for col in ("plan", "fact", "cloudiness", "temperature", "wind_speed")}, index=index)
+    df["object_name"] = "a"
+    chunks = [df.iloc[start:start + 100] for start in range(0, len(df), 100)]
+    results = compute_analysis_streaming(chunks, len(df), max_points)
+    assert 0 < len(results["series"]["date"]) <= max_points
+
+
+@pytest.mark.parametrize("max_points", [1, 5])
+def test_too_small_max_points_is_rejected(max_points):
+    with pytest.raises(ValidationError):
+        AnalysisParams(max_points=max_points)
+    AnalysisParams(max_points=0)
+    AnalysisParams(max_points=6)
@@ -0,0 +1,97 @@
+import json
+import tracemalloc
+
+import pytest
+
+from src.records import RecordStreamParser
+
+RECORDS = [
+    {"date": "2024-01-01 00:00:00", "object_name": "Zadarya", "plan": 1.5, "fact": -2e-3, "ok": True, "note": None},
+    {"date": "2024-01-01 01:00:00", "object_name": "Зада\"рья", "plan": 10, "fact": 0.25, "ok": False, "note": "a, b]"},
+]
+
+
+def feed_by(parser: RecordStreamParser, body: bytes, size: int) -> list[dict]:
+    records = []
+    for start in range(0, len(body), size):
+        records += parser.feed(body[start:start + size])
+    return records + parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_array_records_split_at_any_byte(size):
+    body = json.dumps(RECORDS, ensure_ascii=False).encode()
+    assert feed_by(RecordStreamParser(is_array=True), body, size) == RECORDS
+
+
+@pytest.mark.parametrize("size", [1, 5, 1000])
+def test_ndjson_records_split_at_any_byte(size):
+    body = "\n".join(json.dumps(record, ensure_ascii=False) for record in RECORDS).encode()
+    assert feed_by(RecordStreamParser(is_array=False), body, size) == RECORDS
+
+
+def test_records_are_returned_as_soon_as_complete():
+    parser = RecordStreamParser(is_array=True)
+    first = json.dumps(RECORDS[0])
+    assert parser.feed(f"[{first}, {{\"date\": ".encode()) == [RECORDS[0]]
+
+
+def test_empty_array():
+    parser = RecordStreamParser(is_array=True)
+    assert parser.feed(b" [ ] ") == []
+    assert parser.close() == []
+
+
+@pytest.mark.parametrize("body", [
+    b'[{"a": 1} {"a": 2}]',
+    b'[{"a": 1};{"a": 2}]',
+    b'[{"a": 1},,{"a": 2}]',
+])
+def test_bad_separator(body):
+    parser = RecordStreamParser(is_array=True)
+    with pytest.raises(ValueError):
+        parser.feed(body)
+        parser.close()
+
+
+@pytest.mark.parametrize("record", [
+    b'{"a": x}',
+    b'{"a": 1 "b": 2}',
+    b"{'a': 1}",
+    b'{"a": 1,}',
+    b'{"a": tru}',
+    b'{"a": "x\\q"}',
+])
+def test_malformed_record_fails_before_end_of_body(record):
+    parser = RecordStreamParser(is_array=True)
+    with pytest.raises(ValueError, match="записи 2"):
+        parser.feed(b'[{"a": 0}, ' + record + b', {"a": 2}')
+
+
+def test_not_an_object():
+    parser = RecordStreamParser(is_array=True)
+    with pytest.raises(ValueError):
+        parser.feed(b"[1, 2]")
+
+
+def test_unfinished_array():
+    parser = RecordStreamParser(is_array=True)
+    parser.feed(b'[{"a": 1}, {"a": 2')
+    with pytest.raises(ValueError, match="не завершен"):
+        parser.close()
+
+
+def test_malformed_first_record_does_not_buffer_body():
+    parser = RecordStreamParser(is_array=True)
+    chunk = (json.dumps(RECORDS[0]) + ", ").encode() * 1000
+    tracemalloc.start()
+    try:
+        with pytest.raises(ValueError):
+            parser.feed(b'[{"a": x}, ')
+            for _ in range(1000):
+                parser.feed(chunk)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert len(parser.buffer) < len(chunk)
+    assert peak < 10 * len(chunk)
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.constants import AggregateFreq, AggregateFunction
+from src.database import Data
+from src.kpi import load_kpi
+from src.rollups import insert_rollups, load_aggregate
+
+DATA_ID = "data"
+
+
+def make_frame(start: str = "2024-01-01", days: int = 60) -> pd.DataFrame:
+    """Normalized hourly frame of one object, plan and fact are 1 every hour"""
+    index = pd.date_range(start, periods=days * 24, freq="h", name="date")
+    return pd.DataFrame({
+        "object_name": "a",
+        "unit": "MWh",
+        "plan": np.ones(len(index)),
+        "fact": np.ones(len(index)),
+        "cloudiness": np.ones(len(index)),
+        "temperature": np.ones(len(index)),
+        "wind_speed": np.ones(len(index)),
+    }, index=index)
+
+
+@pytest.fixture
+def data_id(session):
+    insert_rollups(session, DATA_ID, make_frame())
+    return DATA_ID
+
+
+@pytest.mark.parametrize("freq, end_date, period, hours", [
+    # 2024-01-01 is monday
+    (AggregateFreq.WEEK, datetime(2024, 1, 2), "2024-01-01", 7 * 24),
+    (AggregateFreq.WEEK, datetime(2024, 1, 7, 23), "2024-01-01", 7 * 24),
+    (AggregateFreq.WEEK, datetime(2024, 1, 8), "2024-01-08", 7 * 24),
+    (AggregateFreq.MONTH, datetime(2024, 1, 5), "2024-01-01", 31 * 24),
+    (AggregateFreq.DAY, datetime(2024, 1, 5, 3), "2024-01-05", 24),
+])
+def test_last_period_is_included_whole(session, data_id, freq, end_date, period, hours):
+    df = load_aggregate(session, data_id, freq, [AggregateFunction.SUM], end_date=end_date)
+    assert df["period"].iloc[-1] == pd.Timestamp(period)
+    assert df["fact_sum"].iloc[-1] == hours
+
+
+@pytest.mark.parametrize("freq, start_date, period, hours", [
+    (AggregateFreq.WEEK, datetime(2024, 1, 10), "2024-01-08", 7 * 24),
+    (AggregateFreq.MONTH, datetime(2024, 1, 20), "2024-01-01", 31 * 24),
+])
+def test_first_period_is_included_whole(session, data_id, freq, start_date, period, hours):
+    df = load_aggregate(session, data_id, freq, [AggregateFunction.SUM], start_date=start_date)
+    assert df["period"].iloc[0] == pd.Timestamp(period)
+    assert df["fact_sum"].iloc[0] == hours
+
+
+@pytest.mark.parametrize("freq, end_date, period, hours", [
+    (AggregateFreq.MONTH, datetime(2024, 1, 5), "2024-01-01", 31 * 24),
+    (AggregateFreq.MONTH, datetime(2024, 2, 1), "2024-02-01", 29 * 24),
+    (AggregateFreq.WEEK, datetime(2024, 1, 2), "2024-01-01", 7 * 24),
+    (AggregateFreq.DAY, datetime(2024, 1, 5, 3), "2024-01-05", 24),
+])
+def test_last_kpi_period_is_included_whole(session, data_id, freq, end_date, period, hours):
+    df = load_kpi(session, freq, by_object=True, data_id=data_id, end_date=end_date)
+    assert df["period"].iloc[-1] == period
+    assert df["rows"].iloc[-1] == hours
+
+
+def test_last_kpi_period_of_all_datasets_is_included_whole(session, data_id):
+    session.add(Data(id=data_id, uri="", extension="csv", original_name="data.csv", size=0, content_hash="hash"))
+    session.commit()
+    df = load_kpi(session, AggregateFreq.MONTH, by_object=False, end_date=datetime(2024, 1, 5))
+    assert df["rows"].tolist() == [31 * 24]
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis import compute_analysis
+from src.normalization import MEASURE_COLUMNS
+from src.streaming import CorrelationAccumulator, compute_analysis_streaming
+
+
+def make_frame(rows: int = 3000, objects: int = 2) -> pd.DataFrame:
+    """Normalized frame of several objects sharing dates, with NaNs spread unevenly over columns and chunks"""
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2023-12-01", periods=rows, freq="h", name="date")
+    frames = []
+    for number in range(objects):
+        fact = 20 + 10 * np.sin(np.arange(rows) * 2 * np.pi / 24) + rng.normal(0, 2, rows)
+        df = pd.DataFrame({
+            "object_name": f"object_{number}",
+            "unit": "MWh",
+            "plan": fact + rng.normal(0, 3, rows),
+            "fact": fact,
+            "cloudiness": rng.uniform(0, 100, rows),
+            "temperature": rng.normal(15, 8, rows) + 1e6, # large offset checks cancellation of second moments
+            "wind_speed": rng.uniform(0, 15, rows),
+        }, index=index)
+        for col, share in zip(MEASURE_COLUMNS, (0.05, 0.1, 0.3, 0.02, 0.5)):
+            df.loc[rng.random(rows) < share, col] = np.nan
+        # column missing in a whole chunk
+        df.iloc[500:1200, df.columns.get_loc("wind_speed")] = np.nan
+        frames.append(df)
+    return pd.concat(frames)
+
+
+def split(df: pd.DataFrame, sizes: list[int]) -> list[pd.DataFrame]:
+    """Chunks of given sizes, rows left over form the last chunk"""
+    bounds = [0, *np.cumsum(sizes).tolist()]
+    if bounds[-1] < len(df):
+        bounds.append(len(df))
+    return [df.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:]) if start < len(df)]
+
+
+def assert_results_equal(expected, actual, path="results"):
+    if isinstance(expected, dict):
+        assert expected.keys() == actual.keys(), path
+        for key in expected:
+            assert_results_equal(expected[key], actual[key], f"{path}.{key}")
+    elif isinstance(expected, np.ndarray):
+        assert expected.shape == actual.shape, path
+        if expected.dtype.kind == "f":
+            np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6, equal_nan=True, err_msg=path)
+        else:
+            np.testing.assert_array_equal(actual, expected, err_msg=path)
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-9), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.mark.parametrize("sizes", [[1], [7, 993, 1, 1999], [1000] * 6, [6000]])
+def test_correlation_accumulator_matches_pandas(sizes):
+    df = make_frame()
+    accumulator = CorrelationAccumulator(len(MEASURE_COLUMNS))
+    for chunk in split(df, sizes):
+        accumulator.update(chunk[MEASURE_COLUMNS].to_numpy(dtype=np.float64))
+    np.testing.assert_allclose(accumulator.correlation(), df[MEASURE_COLUMNS].corr().to_numpy(), rtol=1e-9, atol=1e-12)
+
+
+def test_correlation_accumulator_without_pairs():
+    values = np.array([[1.0, np.nan], [2.0, np.nan], [np.nan, 3.0]])
+    accumulator = CorrelationAccumulator(2)
+    accumulator.update(values[:2])
+    accumulator.update(values[2:])
+    expected = pd.DataFrame(values).corr().to_numpy()
+    np.testing.assert_array_equal(np.isnan(accumulator.correlation()), np.isnan(expected))
+
+
+@pytest.mark.parametrize("sizes", [[500] * 12, [7, 993, 1, 1999, 3000]])
+def test_streaming_analysis_matches_in_memory(sizes):
+    df = make_frame()
+    expected = compute_analysis(df)
+    actual = compute_analysis_streaming(split(df, sizes), len(df), max_points=0)
+
+    # objects share dates, so rows of equal date may come in different order
+    for results in (expected, actual):
+        series = results["series"]
+        order = np.lexsort((series["fact"], series["plan"], series["date"]))
+        results["series"] = {key: values[order] for key, values in series.items()}
+    assert_results_equal(expected, actual)